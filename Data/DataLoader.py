@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from SweepStore import SweepStore
+
+# Shared loader of the simulation output used by the Plot_* scripts, e.g.
+#   Cellular = load_sweep('Data/FullModelCellular_k31_%.2f_%i.txt', p, range(1, 21), names, 480)
+#   Cellular[i, r - 1]['Ve']
+# Files are parsed with np.loadtxt and the (values, replicates, times) array of a sweep is cached in
+# .cache/ next to the files. The cache is rebuilt when any file is newer or has changed size.
+# Sweeps with a SweepStore (<folder>/<Output>_<sweep>.npy, see RunSweep.py --store and SweepStore.py) holding
+# all the runs asked for are read from it instead, with one slice of the memory mapped array.
+
+
+def load_run(file_name, names, max_rows=None):
+    # Structured array with the given column names, like np.genfromtxt(..., skip_header=1, names=names).
+    # Runs shorter than max_rows are padded with NaN, columns missing from older files are NaN.
+    with open(file_name) as f:
+        columns = len(f.readline().split(','))
+    usecols = range(min(columns, len(names)))
+    data = np.loadtxt(file_name, delimiter=',', skiprows=1, max_rows=max_rows, usecols=usecols, ndmin=2)
+    rows = max_rows if max_rows is not None else len(data)
+    run = np.full(rows, np.nan, dtype=[(name, float) for name in names])
+    for j in usecols:
+        run[names[j]][:len(data)] = data[:, j]
+    return run
+
+
+def store_path(file_format):
+    # <folder>/<Output>_<sweep> of a file_format <folder>/<Output>_<sweep>_%.2f[_%.2f]_%i.txt, else None
+    match = re.match(r'^(.*?)(?:_%\.2f)+_%i\.txt$', file_format)
+    return match.group(1) if match else None
+
+
+def load_store(path, values, replicates, names, max_rows):
+    # Runs of a SweepStore like load_sweep, None if the store lacks any of them. names are given to the
+    # store columns in order, as to the file columns in load_run.
+    store = SweepStore(path)
+    try:
+        value_indices = [store.value_index(v) for v in values]
+        replicate_indices = [store.replicates.index(r) for r in replicates]
+    except ValueError:
+        return None
+    data = store.data[:, :, :max_rows][np.ix_(value_indices, replicate_indices)]
+    if np.isnan(data[..., 0]).all(axis=-1).any():
+        return None
+    rows = max_rows if max_rows is not None else data.shape[2]
+    sweep = np.full((len(values), len(replicates), rows), np.nan, dtype=[(name, float) for name in names])
+    for j in range(min(len(names), data.shape[-1])):
+        sweep[names[j]][:, :, :data.shape[2]] = data[..., j]
+    return sweep
+
+
+def load_sweep(file_format, values, replicates, names, max_rows, cache=True):
+    # Runs file_format % (value(s)..., replicate) as a structured array of shape (values, replicates, times)
+    values = [tuple(np.atleast_1d(v).tolist()) for v in values]
+    replicates = list(replicates)
+    path = store_path(file_format)
+    if path and os.path.exists(path + '.npy'):
+        data = load_store(path, values, replicates, names, max_rows)
+        if data is not None:
+            return data
+    file_names = [[file_format % (v + (r,)) for r in replicates] for v in values]
+
+    stamp = [[os.stat(f).st_mtime_ns, os.stat(f).st_size] for row in file_names for f in row]
+    key = hashlib.sha1(json.dumps([file_format, values, replicates, list(names), max_rows]).encode()).hexdigest()
+    cache_file = os.path.join(os.path.dirname(file_format) or '.', '.cache', key + '.npz')
+    if cache and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if cached['stamp'].tolist() == stamp:
+                return cached['data']
+
+    data = np.array([[load_run(f, names, max_rows) for f in row] for row in file_names])
+    if cache:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        np.savez(cache_file, data=data, stamp=np.array(stamp))
+    return data
+
+
+def load_replicates(file_format, replicates, names, max_rows, cache=True):
+    # Runs file_format % replicate as a structured array of shape (replicates, times)
+    return load_sweep(file_format, [()], replicates, names, max_rows, cache)[0]
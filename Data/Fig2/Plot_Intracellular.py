@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_run, load_replicates
 
 plt.rcParams.update({'font.size': 15})
 plt.rcParams['svg.fonttype'] = 'none'
@@ -13,12 +17,13 @@ replicates = 20
 
 mean = True
 
+ODEf = load_run('Data/JordanOriginalODE_1.txt', ODEnames, CC3Dts)
+CC3D = load_replicates('Data/JordanOriginalCC3D_%i.txt', range(1, replicates + 1), CC3Dnames, CC3Dts)
+
 def Plot_Intracellular(variable, color=None, title=None, xlabel='Time (hrs)', ylabel=None , mean = False):
-    ODEf = np.genfromtxt('Data/JordanOriginalODE_1.txt', skip_header=1, delimiter=',', names=ODEnames, max_rows=CC3Dts)
     V = np.zeros((CC3Dts, replicates))
     for r in range(1, replicates + 1):
-        f = np.genfromtxt('Data/JordanOriginalCC3D_%i.txt' % (r), skip_header=1, delimiter=',', names=CC3Dnames,
-                          max_rows=CC3Dts)
+        f = CC3D[r - 1]
         T = f['Time']
         V[:, r - 1] = f['CC3D%s' % variable]
     if variable == 'IFNe_Field':
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_replicates
 plt.rcParams.update({'font.size': 15})
 
 CellNames = ['Time','U','I1','I2','D','Ve','IFNe']
@@ -7,10 +11,12 @@ ts = 480
 replicates = 20
 mean = False
 
+Cellular = load_replicates('Data/FullModelCellular_%i.txt', range(1, replicates + 1), CellNames, ts)
+
 def plot_CellType(type , mean = False, color = None):
     T = np.zeros((ts, replicates))
     for r in range(1, replicates + 1):
-        f = np.genfromtxt('Data/FullModelCellular_%i.txt' % (r), skip_header=1, delimiter=',', names=CellNames,max_rows = ts)
+        f = Cellular[r - 1]
         T[:, r - 1] = f[type]
     if not mean:
         plt.plot(f['Time'], np.percentile(T, 50, axis=1), color=color, linewidth=4.0)
@@ -40,8 +46,7 @@ plt.clf()
 def plot_Cellular(variable, mean = False, color = None, title = None, xlabel = 'Time (hrs)', ylabel = None):
     V = np.zeros((ts, replicates))
     for r in range(1, replicates + 1):
-        f = np.genfromtxt('Data/FullModelCellular_%i.txt' % (r), skip_header=1, delimiter=',', names=CellNames,
-                          max_rows=ts)
+        f = Cellular[r - 1]
         V[:, r - 1] = f[variable]
     epsilon = 1E-20
     if not mean:
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_replicates
 
 plt.rcParams.update({'font.size': 15})
 plt.rcParams['svg.fonttype'] = 'none'
@@ -11,12 +15,13 @@ ODEnames = ['Time', 'ODEV', 'ODEH', 'ODEP', 'ODEIFNe', 'ODESTATP', 'ODEIRF7', 'O
 
 mean = False
 
+Intracellular = load_replicates('Data/FullModelIntracellular_%i.txt', range(1, 21), CC3Dnames, CC3Dts)
+
 def Plot_Intracellular(variable, color=None, title=None, xlabel='Time (hrs)', ylabel=None, mean = False):
     V = np.zeros((CC3Dts, 20))
     plt.figure(figsize=([6.2, 4.8]))
     for r in range(1, 21):
-        f = np.genfromtxt('Data/FullModelIntracellular_%i.txt' % (r), skip_header=1, delimiter=',', names=CC3Dnames,
-                          max_rows=CC3Dts)
+        f = Intracellular[r - 1]
         T = f['Time']
         V[:, r - 1] = f['CC3D%s' % variable]
     epsilon = 1E-20
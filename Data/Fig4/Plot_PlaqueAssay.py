@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_replicates
 plt.rcParams.update({'font.size': 15})
 
 ts = 480
@@ -8,10 +12,12 @@ cell_diameter = 3
 Names = ['Time','avgI1rd','avgI2rd','avgDrd','Beta','Beff']
 mean = False
 
+Plaque = load_replicates('Data/PlaqueAssay_%i.txt', range(1, replicates + 1), Names, ts)
+
 def plot_Radius(variable, color = None, mean = False):
     avgrd = np.zeros((ts, replicates))
     for r in range(1, replicates + 1):
-        f = np.genfromtxt('Data/PlaqueAssay_%i.txt' % (r), skip_header=1, delimiter=',', names=Names, max_rows=ts)
+        f = Plaque[r - 1]
         avgrd[:, r - 1] = f['avg%srd' % variable]
     if not mean:
         plt.plot(f['Time'], np.percentile(avgrd, 50, axis = 1) / cell_diameter, color=color, linewidth=4.0, label=variable)
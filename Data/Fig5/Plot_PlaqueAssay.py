@@ -1,5 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_sweep
+from SweepMetrics import growth_rate
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','avgI1rd','avgI2rd','avgDrd']
@@ -17,6 +22,9 @@ cell_diameter = 3.0
 mean = True
 plot_Individual = False
 
+Plaque = load_sweep('Data/PlaqueAssay_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicates+1), names, ts)
+GrowthRate = growth_rate(Plaque['Time'], Plaque['avgI1rd'])
+
 def plot_Radius(T,data,name, color = None, mean= False):
     if not mean:
         plt.plot(T, np.percentile(data, 50, axis = 1) / cell_diameter, color=color, linewidth=4.0, label=name)
@@ -32,14 +40,12 @@ for i in range(len(p)):
     avgI1rd = np.zeros((ts, replicates))
     avgI2rd = np.zeros((ts, replicates))
     avgDrd = np.zeros((ts, replicates))
-    bpI1r = np.zeros(replicates)
+    bpI1r = GrowthRate[i]
     for r in range(1,replicates+1):
-        f = np.genfromtxt('Data/PlaqueAssay_%s_%.2f_%i.txt' % (parameter,p[i],r), skip_header=1, delimiter=',', names=names,max_rows=ts)
+        f = Plaque[i, r - 1]
         avgI1rd[:, r - 1] = f['avgI1rd']
         avgI2rd[:, r - 1] = f['avgI2rd']
         avgDrd[:, r - 1] = f['avgDrd']
-        [mI1, y0I1] = np.polyfit(f['Time'][-10:],f['avgI1rd'][-10:], 1)
-        bpI1r[ r - 1] = mI1
         if plot_Individual:
             plt.plot(f['Time'], f['avgI1rd'] / cell_diameter, color='orange', linewidth=4.0, label='I1')
             plt.plot(f['Time'], f['avgI2rd'] / cell_diameter, color='red', linewidth=4.0, label='I2')
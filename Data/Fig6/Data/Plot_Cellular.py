@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from DataLoader import load_sweep
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','U','I1','I2','D','Ve','IFNe']
@@ -19,13 +23,14 @@ IFNeAUCMax = np.zeros(len(p))
 IFNeMax = np.zeros(len(p))
 IFNeMaxMin = np.zeros(len(p))
 IFNeMaxMax = np.zeros(len(p))
+Cellular = load_sweep('FullModelCellular_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicate+1), names, t)
 for i in range(len(p)):
     TVe = np.zeros((replicate))
     TVeMax = np.zeros((replicate))
     TIFNe = np.zeros((replicate))
     TIFNeMax = np.zeros((replicate))
     for r in range(1,replicate+1):
-        f = np.genfromtxt('FullModelCellular_%s_%.2f_%i.txt' % (parameter,p[i],r), skip_header=1, delimiter=',', names=names,max_rows=t)
+        f = Cellular[i, r - 1]
         TVe[r-1] = np.sum(f['Ve'])
         TVeMax[r - 1] = np.amax(f['Ve'])
         TIFNe[r - 1] = np.sum(f['IFNe'])
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from DataLoader import load_sweep
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','avgI1rd','avgI2rd','avgDrd','Beta','Beff']
@@ -11,13 +15,14 @@ bpI1 = np.zeros(len(p))
 bpI1Min = np.zeros(len(p))
 bpI1Max = np.zeros(len(p))
 cell_diameter = 3.0
+Plaque = load_sweep('PlaqueAssay_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicates+1), names, ts)
 for i in range(len(p)):
     avgI1rd = np.zeros((ts, replicates))
     avgI2rd = np.zeros((ts, replicates))
     avgDrd = np.zeros((ts, replicates))
     bpI1r = np.zeros(replicates)
     for r in range(1,replicates+1):
-        f = np.genfromtxt('PlaqueAssay_%s_%.2f_%i.txt' % (parameter,p[i],r), skip_header=1, delimiter=',', names=names,max_rows=ts)
+        f = Plaque[i, r - 1]
         avgI1rd[:, r - 1] = f['avgI1rd']
         avgI2rd[:, r - 1] = f['avgI2rd']
         avgDrd[:, r - 1] = f['avgDrd']
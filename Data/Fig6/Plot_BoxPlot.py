@@ -1,5 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_sweep
+from SweepMetrics import sweep_metrics
 # plt.rcParams.update({'font.size': 15})
 
 names_Cellular= ['Time','U','I1','I2','D','Ve','IFNe']
@@ -11,30 +16,12 @@ parameter = 'k11'
 p = [0.0,0.03,0.05,0.07,0.10,0.12,0.15,0.17,0.20,0.23,0.25,0.5,0.75,1.0]
 dt = 1.666667e-01
 
-VeAUC = []
-IFNeAUC = []
-GrowthRate = []
-for i in range(len(p)):
-    iVeAUC = []
-    iIFNeAUC = []
-    iGrowthRate = []
-    for r in range(1,replicate+1):
-        f = np.genfromtxt('Data/FullModelCellular_%s_%.2f_%i.txt' % (parameter,p[i],r),
-                          skip_header=1, delimiter=',',
-                          names=names_Cellular,
-                          max_rows=t)
-        iVeAUC.append(np.log10(np.trapz(f['Ve'], dx = dt)))
-        iIFNeAUC.append(np.log10(np.trapz(f['IFNe'],dx = dt)))
-        f = np.genfromtxt('Data/PlaqueAssay_%s_%.2f_%i.txt' % (parameter, p[i], r),
-                          skip_header=1,
-                          delimiter=',',
-                          names=names_Plaque,
-                          max_rows=t)
-        [mI1, y0I1] = np.polyfit(f['Time'][-10:],f['avgI1rd'][-10:], 1)
-        iGrowthRate.append(mI1)
-    VeAUC.append(iVeAUC)
-    IFNeAUC.append(iIFNeAUC)
-    GrowthRate.append(iGrowthRate)
+Cellular = load_sweep('Data/FullModelCellular_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicate+1), names_Cellular, t)
+Plaque = load_sweep('Data/PlaqueAssay_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicate+1), names_Plaque, t)
+Metrics = sweep_metrics(Cellular, Plaque, dt)
+VeAUC = list(np.log10(Metrics['VeAUC']))
+IFNeAUC = list(np.log10(Metrics['IFNeAUC']))
+GrowthRate = list(Metrics['GrowthRate'])
 
 ## No Outliers Plots
 plt.boxplot(VeAUC,
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_replicates
 plt.rcParams.update({'font.size': 15})
 
 CC3Dnames = ['Time','CC3DV','CC3DH','CC3DP','CC3DIFNe_Scalar','CC3DIFNe_Field','CC3DSTATP','CC3DIRF7','CC3DIRF7P','CC3DIFN']
@@ -11,12 +15,13 @@ replicates = 20
 
 mean = False
 
+Intracellular = load_replicates('Data/FullModelIntracellular_%i.txt', range(1, 21), CC3Dnames, CC3Dts)
+
 def Plot_Intracellular(variable, color=None, title=None, xlabel='Time (hrs)', ylabel=None, mean = False, log = True):
     V = np.zeros((CC3Dts, 20))
     plt.figure(figsize=([6.2, 4.8]))
     for r in range(1, 21):
-        f = np.genfromtxt('Data/FullModelIntracellular_%i.txt' % (r), skip_header=1, delimiter=',', names=CC3Dnames,
-                          max_rows=CC3Dts)
+        f = Intracellular[r - 1]
         T = f['Time']
         V[:, r - 1] = f['CC3D%s' % variable]
     if log:
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_replicates
 
 
 ts = 480
@@ -10,8 +14,9 @@ avgI1rd = np.zeros((ts, replicates))
 avgI2rd = np.zeros((ts, replicates))
 avgDrd = np.zeros((ts, replicates))
 Beff = np.zeros((ts, replicates))
+Plaque = load_replicates('PlaqueAssay_%i.txt', range(1,replicates+1), Names, ts)
 for r in range(1,replicates+1):
-    f = np.genfromtxt('PlaqueAssay_%i.txt' % (r), skip_header=1, delimiter=',', names = Names, max_rows = ts)
+    f = Plaque[r - 1]
     plt.plot(f['Time'], f['avgI1rd']/cell_diameter, color='orange',linewidth = 3.0, alpha=0.075)
     plt.plot(f['Time'], f['avgI2rd']/cell_diameter, color='red',linewidth = 3.0, alpha=0.075)
     plt.plot(f['Time'], f['avgDrd']/cell_diameter, color='purple',linewidth = 3.0, alpha=0.075)
@@ -30,7 +35,7 @@ plt.clf()
 
 Beff = np.zeros((ts, replicates))
 for r in range(1,replicates+1):
-    f = np.genfromtxt('PlaqueAssay_%i.txt' % (r), skip_header=1, delimiter=',', names = Names, max_rows = ts)
+    f = Plaque[r - 1]
     plt.plot(f['Time'][f['Beff']>0], f['Beff'][f['Beff']>0], color='black',linewidth = 3.0, alpha=0.075)
     Beff[:, r - 1] = f['Beff']
 plt.plot(f['Time'][np.mean(Beff,1)>0],np.mean(Beff,1)[np.mean(Beff,1)>0],color='black',linewidth = 3.0,label='Effective Infectivity')
@@ -1,5 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_sweep
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','avgI1rd','avgI2rd','avgDrd','Beta','Beff']
@@ -24,6 +28,8 @@ def plot_Radius(T,data,name, color = None, mean= False):
     plt.fill_between(T, lower_bound, upper_bound,facecolor=color, interpolate=True, alpha=0.2)
 
 
+Plaque = load_sweep('Data/PlaqueAssay_%s_%%.2f_%%.2f_%%i.txt' % parameter, [(pI, pV) for pI in p_I for pV in p_V],
+                    range(1,replicates+1), names, ts).reshape(len(p_I), len(p_V), replicates, ts)
 for i in range(len(p_I)):
     for j in range(len(p_V)):
         avgI1rd = np.zeros((ts, replicates))
@@ -31,7 +37,7 @@ for i in range(len(p_I)):
         avgDrd = np.zeros((ts, replicates))
         # plt.title('Plaque Growth\n%s *= %.2f,\n%s *= %.2f' % ('IFN dc', p_I[i],'Virus dc', p_V[j]))
         for r in range(1,replicates+1):
-            f = np.genfromtxt('Data/PlaqueAssay_%s_%.2f_%.2f_%i.txt' % (parameter,p_I[i],p_V[j],r), skip_header=1, delimiter=',', names=names,max_rows=ts)
+            f = Plaque[i, j, r - 1]
             avgI1rd[:, r - 1] = f['avgI1rd']
             avgI2rd[:, r - 1] = f['avgI2rd']
             avgDrd[:, r - 1] = f['avgDrd']
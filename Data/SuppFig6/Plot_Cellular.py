@@ -1,5 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_sweep
+from SweepMetrics import auc, peak
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','U','I1','I2','D','Ve','IFNe']
@@ -10,35 +15,23 @@ parameter = 'beta'
 p = [0.01, 0.08, 0.1, 0.13, 0.16, 0.20, 0.25, 0.32, 0.40, 0.50, 0.63, 0.79, 1.0, 1.26, 10.0, 100.0]
 dt = 1.666667e-01
 
-VeAUC = np.zeros(len(p))
-VeAUCMin = np.zeros(len(p))
-VeAUCMax = np.zeros(len(p))
 VeMax = np.zeros(len(p))
 VeMaxMin = np.zeros(len(p))
 VeMaxMax = np.zeros(len(p))
-IFNeAUC = np.zeros(len(p))
-IFNeAUCMin = np.zeros(len(p))
-IFNeAUCMax = np.zeros(len(p))
 IFNeMax = np.zeros(len(p))
 IFNeMaxMin = np.zeros(len(p))
 IFNeMaxMax = np.zeros(len(p))
-for i in range(len(p)):
-    TVe = np.zeros((replicate))
-    TVeMax = np.zeros((replicate))
-    TIFNe = np.zeros((replicate))
-    TIFNeMax = np.zeros((replicate))
-    for r in range(1,replicate+1):
-        f = np.genfromtxt('Data/FullModelCellular_%s_%.2f_%i.txt' % (parameter,p[i],r), skip_header=1, delimiter=',', names=names,max_rows=t)
-        TVe[r-1] = np.trapz(f['Ve'], dx = dt)
-        TVeMax[r - 1] = np.amax(f['Ve'])
-        TIFNe[r - 1] = np.trapz(f['IFNe'],dx = dt)
-        TIFNeMax[r - 1] = np.amax(f['IFNe'])
-    VeAUC[i] = np.median(TVe)
-    VeAUCMin[i] = np.percentile(TVe,10)
-    VeAUCMax[i] = np.percentile(TVe,90)
-    IFNeAUC[i] = np.median(TIFNe)
-    IFNeAUCMin[i] = np.percentile(TIFNe,10)
-    IFNeAUCMax[i] = np.percentile(TIFNe,90)
+Cellular = load_sweep('Data/FullModelCellular_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicate+1), names, t)
+TVe = auc(Cellular['Ve'], dt)
+TVeMax = peak(Cellular['Ve'])
+TIFNe = auc(Cellular['IFNe'], dt)
+TIFNeMax = peak(Cellular['IFNe'])
+VeAUC = np.median(TVe, axis=1)
+VeAUCMin = np.percentile(TVe, 10, axis=1)
+VeAUCMax = np.percentile(TVe, 90, axis=1)
+IFNeAUC = np.median(TIFNe, axis=1)
+IFNeAUCMin = np.percentile(TIFNe, 10, axis=1)
+IFNeAUCMax = np.percentile(TIFNe, 90, axis=1)
 
 plt.plot(p,VeAUC,color='#666699',linewidth = 4.0, label = 'Virus AUC')
 plt.fill_between(p, VeAUCMin,VeAUCMax, facecolor='#666699', interpolate=True, alpha=0.2)
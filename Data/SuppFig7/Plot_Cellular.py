@@ -1,5 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DataLoader import load_sweep
+from SweepMetrics import auc
 plt.rcParams.update({'font.size': 15})
 
 names = ['Time','U','I1','I2','D','Ve','IFNe']
@@ -10,25 +15,15 @@ parameter = 'k71'
 p = [0.1,0.5,1.0,2.0, 3.16, 3.98, 5.0, 6.31, 7.94, 10.0, 12.59]
 dt = 1.666667e-01
 
-VeAUC = np.zeros(len(p))
-VeAUCMin = np.zeros(len(p))
-VeAUCMax = np.zeros(len(p))
-IFNeAUC = np.zeros(len(p))
-IFNeAUCMin = np.zeros(len(p))
-IFNeAUCMax = np.zeros(len(p))
-for i in range(len(p)):
-    TVe = np.zeros((replicate))
-    TIFNe = np.zeros((replicate))
-    for r in range(1,replicate+1):
-        f = np.genfromtxt('Data/FullModelCellular_%s_%.2f_%i.txt' % (parameter,p[i],r), skip_header=1, delimiter=',', names=names,max_rows=t)
-        TVe[r-1] = np.trapz(f['Ve'], dx = dt)
-        TIFNe[r - 1] = np.trapz(f['IFNe'],dx = dt)
-    VeAUC[i] = np.mean(TVe)
-    VeAUCMin[i] = np.amin(TVe)
-    VeAUCMax[i] = np.amax(TVe)
-    IFNeAUC[i] = np.mean(TIFNe)
-    IFNeAUCMin[i] = np.amin(TIFNe)
-    IFNeAUCMax[i] = np.amax(TIFNe)
+Cellular = load_sweep('Data/FullModelCellular_%s_%%.2f_%%i.txt' % parameter, p, range(1,replicate+1), names, t)
+TVe = auc(Cellular['Ve'], dt)
+TIFNe = auc(Cellular['IFNe'], dt)
+VeAUC = np.mean(TVe, axis=1)
+VeAUCMin = np.amin(TVe, axis=1)
+VeAUCMax = np.amax(TVe, axis=1)
+IFNeAUC = np.mean(TIFNe, axis=1)
+IFNeAUCMin = np.amin(TIFNe, axis=1)
+IFNeAUCMax = np.amax(TIFNe, axis=1)
 
 plt.plot(p,VeAUC,color='#666699',linewidth = 4.0, label = 'Virus AUC')
 plt.fill_between(p, VeAUCMin,VeAUCMax, facecolor='#666699', interpolate=True, alpha=0.2)
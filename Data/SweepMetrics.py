@@ -0,0 +1,151 @@
+import argparse
+import glob
+import os
+import re
+import numpy as np
+from DataLoader import load_sweep
+from SweepStore import SweepStore
+
+# Summary statistics of whole sweeps, computed over the (values, replicates, times) arrays of
+# DataLoader.load_sweep (or SweepStore) at once, e.g.
+#   Cellular = load_sweep('Data/FullModelCellular_k31_%.2f_%i.txt', p, range(1, 21), names_Cellular, 480)
+#   VeAUC = auc(Cellular['Ve'], dt)  # (values, replicates)
+# sweep_metrics() gives the metrics of the Fig9 sensitivity tables, metrics_table() one row per run.
+
+dt = 1.666667e-01  # hrs between output rows
+growth_rate_points = 10  # Plaque growth rate is the slope of the radius over the last 10 output rows
+metric_names = ['VeAUC', 'VeMax', 'IFNeAUC', 'IFNeMax', 'GrowthRate']
+
+
+def auc(data, dt=dt):
+    # Trapezoidal area under the curve along the time axis (same as np.trapz(data, dx=dt, axis=-1))
+    return dt * (np.sum(data, axis=-1) - (data[..., 0] + data[..., -1]) / 2.0)
+
+
+def peak(data):
+    return np.max(data, axis=-1)
+
+
+def slope(x, y):
+    # Least squares slope along the last axis (same as np.polyfit(x, y, 1)[0] for each curve)
+    x = np.broadcast_to(x, np.shape(y))
+    dx = x - np.mean(x, axis=-1, keepdims=True)
+    dy = y - np.mean(y, axis=-1, keepdims=True)
+    return np.sum(dx * dy, axis=-1) / np.sum(dx * dx, axis=-1)
+
+
+def growth_rate(time, radius, points=growth_rate_points):
+    return slope(time[..., -points:], radius[..., -points:])
+
+
+def sweep_metrics(cellular, plaque, dt=dt):
+    # cellular, plaque: structured arrays of FullModelCellular and PlaqueAssay runs of matching shape
+    return {'VeAUC': auc(cellular['Ve'], dt),
+            'VeMax': peak(cellular['Ve']),
+            'IFNeAUC': auc(cellular['IFNe'], dt),
+            'IFNeMax': peak(cellular['IFNe']),
+            'GrowthRate': growth_rate(plaque['Time'], plaque['avgI1rd'])}
+
+
+def metrics_table(values, replicates, metrics):
+    # One row per run: Value (Value1, Value2, ... for sweeps over several parameters), Replicate, metrics...
+    values = [tuple(np.atleast_1d(v).tolist()) for v in values]
+    replicates = list(replicates)
+    value_names = ['Value'] if len(values[0]) == 1 else ['Value%i' % (k + 1) for k in range(len(values[0]))]
+    table = np.zeros((len(values), len(replicates)),
+                     dtype=[(name, float) for name in value_names + ['Replicate'] + list(metrics)])
+    for k, name in enumerate(value_names):
+        table[name] = np.array([v[k] for v in values])[:, None]
+    table['Replicate'] = np.array(replicates)[None, :]
+    for name, metric in metrics.items():
+        table[name] = metric
+    return table.ravel()
+
+
+def save_table(path, table):
+    with open(path, 'w') as f:
+        f.write(','.join(table.dtype.names) + '\n')
+        row_format = ','.join(['%g'] * len(table.dtype.names)) + '\n'
+        f.write(''.join(row_format % tuple(row) for row in table))
+
+
+def store_metrics(stores, times=480, dt=dt):
+    # folder_metrics() of the runs written to the FullModelCellular and PlaqueAssay stores
+    cellular, plaque = [SweepStore(path) for path in stores]
+    values = sorted(v for v in cellular.values if v in plaque.values)
+    all_replicates = sorted(r for r in cellular.replicates if r in plaque.replicates)
+
+    def written(store, v, r):
+        return not np.isnan(store.data[store.value_index(v), store.replicates.index(r), :, 0]).all()
+
+    missing = ['%s %s %i' % (store.path, v, r) for v in values for r in all_replicates for store in [cellular, plaque]
+               if not written(store, v, r)]
+    replicates = [r for r in all_replicates if all(written(s, v, r) for v in values for s in [cellular, plaque])]
+    if not replicates:
+        raise ValueError('No replicate complete for all values in %s and %s' % tuple(stores))
+    if missing:
+        print('%i runs missing from the stores, using %i of %i replicates, missing:\n%s'
+              % (len(missing), len(replicates), len(all_replicates), '\n'.join(missing)))
+
+    run_format = '%s_' + '_'.join(['%%.2f'] * len(values[0])) + '_%%i.txt'
+    return metrics_table(values, replicates, sweep_metrics(
+        load_sweep(run_format % stores[0], values, replicates, ['Time', 'U', 'I1', 'I2', 'D', 'Ve', 'IFNe'], times),
+        load_sweep(run_format % stores[1], values, replicates, ['Time', 'avgI1rd', 'avgI2rd', 'avgDrd'], times),
+        dt))
+
+
+def folder_metrics(folder, sweep, times=480, dt=dt):
+    # Metrics table of all <folder>/FullModelCellular_<sweep>_<values>_<replicate>.txt runs with a
+    # matching PlaqueAssay file, or of the runs of the FullModelCellular and PlaqueAssay sweep stores when
+    # the folder has them. The table is over the replicates complete for every value, the runs left out of
+    # it are reported.
+    stores = [os.path.join(folder, '%s_%s' % (output, sweep)) for output in ['FullModelCellular', 'PlaqueAssay']]
+    if all(os.path.exists(path + '.npy') for path in stores):
+        return store_metrics(stores, times, dt)
+
+    pattern = re.compile(r'^FullModelCellular_%s_((?:[0-9.]+_)+)([0-9]+)\.txt$' % sweep)
+    runs = set()
+    for file_name in glob.glob(os.path.join(folder, 'FullModelCellular_%s_*.txt' % sweep)):
+        match = pattern.match(os.path.basename(file_name))
+        if match:
+            runs.add((tuple(float(v) for v in match.group(1).strip('_').split('_')), int(match.group(2))))
+    if not runs:
+        raise ValueError('No FullModelCellular_%s files in %s' % (sweep, folder))
+    values = sorted(set(v for v, r in runs))
+    run_format = '%s_' + '_'.join(['%%.2f'] * len(values[0])) + '_%%i.txt'
+
+    # Complete runs have both files
+    def run_file(output, v, r):
+        return os.path.join(folder, (run_format % (output + '_' + sweep)) % (v + (r,)))
+
+    all_replicates = sorted(set(r for v, r in runs))
+    missing = [run_file(output, v, r) for v in values for r in all_replicates
+               for output in ['FullModelCellular', 'PlaqueAssay'] if not os.path.exists(run_file(output, v, r))]
+    replicates = [r for r in all_replicates
+                  if all((v, r) in runs and os.path.exists(run_file('PlaqueAssay', v, r)) for v in values)]
+    if not replicates:
+        raise ValueError('No replicate of %s complete for all values in %s, missing:\n%s'
+                         % (sweep, folder, '\n'.join(missing)))
+    if missing:
+        print('%i missing files, using %i of %i replicates, missing:\n%s'
+              % (len(missing), len(replicates), len(all_replicates), '\n'.join(missing)))
+
+    cellular = load_sweep(os.path.join(folder, run_format % ('FullModelCellular_' + sweep)), values, replicates,
+                          ['Time', 'U', 'I1', 'I2', 'D', 'Ve', 'IFNe'], times)
+    plaque = load_sweep(os.path.join(folder, run_format % ('PlaqueAssay_' + sweep)), values, replicates,
+                        ['Time', 'avgI1rd', 'avgI2rd', 'avgDrd'], times)
+    return metrics_table(values, replicates, sweep_metrics(cellular, plaque, dt))
+
+
+if __name__ == '__main__':
+    # python SweepMetrics.py Fig5/Data k31 --output Fig9/k31.Metrics.csv
+    parser = argparse.ArgumentParser(description='Per run AUC, peak and plaque growth rate of a sweep')
+    parser.add_argument('folder')
+    parser.add_argument('sweep')
+    parser.add_argument('--times', type=int, default=480)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    table = folder_metrics(args.folder, args.sweep, args.times)
+    output = args.output or os.path.join(args.folder, '%s.Metrics.csv' % args.sweep)
+    save_table(output, table)
+    print('%s: %i runs' % (output, len(table)))
@@ -0,0 +1,117 @@
+import argparse
+import glob
+import json
+import os
+import re
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class SweepStore:
+    # All runs of one output (e.g. FullModelCellular) of one sweep in a single array of shape
+    # (values, replicates, times, variables), saved as <path>.npy and memory mapped on open.
+    # The axes are described in <path>.json. Runs not written yet are NaN.
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        self.values = [tuple(v) for v in meta['values']]
+        self.replicates = meta['replicates']
+        self.columns = meta['columns']
+        self.data = open_memmap(path + '.npy', mode=mode)
+
+    @classmethod
+    def create(cls, path, values, replicates, times, columns):
+        values = [tuple(np.atleast_1d(v).tolist()) for v in values]
+        with open(path + '.json', 'w') as f:
+            json.dump({'values': values, 'replicates': list(replicates), 'columns': list(columns)}, f)
+        data = open_memmap(path + '.npy', mode='w+', dtype=float,
+                           shape=(len(values), len(replicates), times, len(columns)))
+        data[:] = np.nan
+        data.flush()
+        return cls(path, mode='r+')
+
+    def extend(self, values, replicates):
+        # Store over its grid plus any new values and replicates (appended), with the runs already written.
+        # The arrays are reallocated and replace the files of this store, which must not be in use elsewhere.
+        values = [tuple(np.atleast_1d(v).tolist()) for v in values]
+        new_values = [v for v in values if not any(len(v) == len(w) and np.allclose(v, w) for w in self.values)]
+        new_replicates = [r for r in replicates if r not in self.replicates]
+        if not new_values and not new_replicates:
+            return self
+        temporary = self.path + '.extend'
+        store = SweepStore.create(temporary, self.values + new_values, self.replicates + new_replicates,
+                                  self.data.shape[2], self.columns)
+        store.data[:len(self.values), :len(self.replicates)] = self.data
+        store.data.flush()
+        del store.data
+        self.data = None
+        for extension in ['.npy', '.json']:
+            os.replace(temporary + extension, self.path + extension)
+        return SweepStore(self.path, mode='r+')
+
+    def value_index(self, values):
+        values = np.atleast_1d(values)
+        for i, v in enumerate(self.values):
+            if len(v) == len(values) and np.allclose(v, values):
+                return i
+        raise ValueError('%s is not a value of this sweep' % values.tolist())
+
+    def write(self, values, replicate, run):
+        # run: structured array with the store columns, or a (times, variables) array
+        if run.dtype.names:
+            run = np.stack([run[c] for c in self.columns], axis=-1)
+        times = min(len(run), self.data.shape[2])
+        self.data[self.value_index(values), self.replicates.index(replicate), :times] = run[:times]
+        self.data.flush()
+
+    def __getitem__(self, column):
+        # (values, replicates, times) view of one variable
+        return self.data[..., self.columns.index(column)]
+
+
+def ingest_folder(folder, output, sweep, times, path=None):
+    # Builds the store of <folder>/<output>_<sweep>_<values>_<replicate>.txt files
+    pattern = re.compile(r'^%s_%s_((?:[0-9.]+_)+)([0-9]+)\.txt$' % (output, sweep))
+    runs = {}
+    for file_name in glob.glob(os.path.join(folder, '%s_%s_*.txt' % (output, sweep))):
+        match = pattern.match(os.path.basename(file_name))
+        if match:
+            values = tuple(float(v) for v in match.group(1).strip('_').split('_'))
+            runs[(values, int(match.group(2)))] = file_name
+    if not runs:
+        raise ValueError('No %s_%s files in %s' % (output, sweep, folder))
+
+    # Older runs prefixed columns with CC3D and wrote extra columns, keep the ones all files have
+    headers = {}
+    for run, file_name in runs.items():
+        with open(file_name) as f:
+            headers[run] = [re.sub('^CC3D', '', c) for c in f.readline().strip().split(',')]
+    columns = [c for c in headers[min(runs)] if all(c in h for h in headers.values())]
+
+    values = sorted(set(v for v, r in runs))
+    replicates = sorted(set(r for v, r in runs))
+    store = SweepStore.create(path or os.path.join(folder, '%s_%s' % (output, sweep)), values, replicates,
+                              times, columns)
+    for run, file_name in sorted(runs.items()):
+        data = np.loadtxt(file_name, delimiter=',', skiprows=1, max_rows=times, ndmin=2)
+        store.write(*run, data[:, [headers[run].index(c) for c in columns]])
+    return store
+
+
+if __name__ == '__main__':
+    # python SweepStore.py Fig5/Data k31 --times 480
+    parser = argparse.ArgumentParser(description='Consolidate the text output of a sweep into sweep stores')
+    parser.add_argument('folder')
+    parser.add_argument('sweep')
+    parser.add_argument('--times', type=int, default=480)
+    parser.add_argument('--outputs', nargs='+', default=['FullModelCellular', 'FullModelIntracellular',
+                                                         'PlaqueAssay'])
+    args = parser.parse_args()
+    for output in args.outputs:
+        try:
+            store = ingest_folder(args.folder, output, args.sweep, args.times)
+        except ValueError as e:
+            print(e)
+            continue
+        print('%s: %s' % (store.path, store.data.shape))
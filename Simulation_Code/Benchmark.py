@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Simulation'))
+from RunConfiguration import RunConfiguration
+from ModelParameters import U, I1, I2, DEAD
+from StandaloneModel import StandaloneModel
+from Profiling import Profiler
+
+# Cost per MCS of the model (StandaloneModel.py) over lattice sizes and infection states, e.g.
+#   python Benchmark.py --sizes 150 300 600 1200 --output Benchmark_<commit>.json
+#   python Benchmark.py --compare Benchmark_old.json Benchmark_new.json
+# Each case runs in its own process, so its peak RSS is its own. A case is set up as a plaque of the
+# given radius (fraction of half the lattice) around the center cell: D inside, then rings of I2 and I1.
+# With ActiveSet, the active region is rebuilt around the seeded plaque. After a few untimed MCS filling the
+# fields, the phases of each MCS are timed with Profiling.Profiler.
+
+infection_states = {
+    'early': 0.0,  # The single infected cell of IFNModel.xml
+    'mid': 0.3,
+    'late': 0.8,
+}
+
+# Fractions of the plaque radius inside which cells are D and I2, I1 out to the radius
+plaque_rings = {DEAD: 0.6, I2: 0.8, I1: 1.0}
+
+
+def seed_plaque(simulation, radius_fraction):
+    size = simulation.config.LatticeSize
+    width = simulation.config.CellWidth
+    if radius_fraction <= 0:
+        return
+    # Distance of each cell center from the center of the lattice, in pixels
+    centers = (np.arange(size // width) + 0.5) * width - size / 2.0
+    distance = np.hypot(centers[:, None], centers[None, :]).ravel()
+    radius = radius_fraction * size / 2.0
+    types = np.full(simulation.number_cells, U)
+    for cell_type in [I1, I2, DEAD]:
+        types[distance < plaque_rings[cell_type] * radius] = cell_type
+    simulation.types[:] = types
+
+    model = simulation.model
+    model['V'][types == I1] = 1e-2
+    model['V'][types == I2] = 1.0
+    model['H'][types == I2] = 0.5
+    simulation.count_types()
+    if simulation.active:
+        simulation.reset_active_region()
+
+
+def run_case(size, state, mcs, warmup, config):
+    settings = dict(config)
+    with tempfile.TemporaryDirectory() as output:
+        settings.update(LatticeSize=size, OutputFolder=output, Profile=False)
+        simulation = StandaloneModel(RunConfiguration(**settings))
+        simulation.profiler = Profiler()
+        seed_plaque(simulation, infection_states[state])
+        for step in range(warmup):
+            simulation.step(step)
+
+        simulation.profiler = Profiler()
+        start = time.perf_counter()
+        for step in range(warmup, warmup + mcs):
+            simulation.step(step)
+        elapsed = time.perf_counter() - start
+        simulation.finish()
+        counts = np.bincount(simulation.types, minlength=DEAD + 1)
+
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2.0 ** 20 if sys.platform == 'darwin' else rss / 2.0 ** 10
+    return {
+        'LatticeSize': size,
+        'State': state,
+        'Cells': int(simulation.number_cells),
+        'Fractions': {name: float(counts[t]) / simulation.number_cells
+                      for name, t in zip(['U', 'I1', 'I2', 'D'], [U, I1, I2, DEAD])},
+        'MCS': mcs,
+        'SecondsPerMCS': elapsed / mcs,
+        'CellsPerSecond': simulation.number_cells * mcs / elapsed,
+        'PhaseSecondsPerMCS': {name: float(np.sum(times)) / mcs for name, times in simulation.profiler.times.items()},
+        'PeakRSSMB': rss_mb,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(c['LatticeSize'], c['State']): c for c in json.load(f)['Cases']}
+    with open(new_path) as f:
+        new = {(c['LatticeSize'], c['State']): c for c in json.load(f)['Cases']}
+    print('%-6s %-6s %14s %14s %8s' % ('Size', 'State', 'Old (ms/MCS)', 'New (ms/MCS)', 'Speedup'))
+    for key in sorted(set(old) & set(new)):
+        old_time, new_time = old[key]['SecondsPerMCS'], new[key]['SecondsPerMCS']
+        print('%-6i %-6s %14.2f %14.2f %8.2f' % (key + (1e3 * old_time, 1e3 * new_time, old_time / new_time)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the IFN model without CC3D')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[150, 300, 600, 1200],
+                        help='Lattice sizes (Dimensions of IFNModel.xml)')
+    parser.add_argument('--states', nargs='+', default=list(infection_states), choices=list(infection_states))
+    parser.add_argument('--mcs', type=int, default=20, help='Timed MCS per case')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed MCS before timing')
+    parser.add_argument('--config', help='JSON file of run settings (see Simulation/RunConfiguration.py)')
+    parser.add_argument('--output', help='JSON file of the results')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files')
+    parser.add_argument('--case', nargs=2, metavar=('SIZE', 'STATE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    config = {name: getattr(RunConfiguration.load(args.config), name) for name in RunConfiguration.defaults}
+    if args.case:
+        # One case in this process, results as JSON on stdout
+        print(json.dumps(run_case(int(args.case[0]), args.case[1], args.mcs, args.warmup, config)))
+        return
+
+    cases = []
+    for size in args.sizes:
+        for state in args.states:
+            command = [sys.executable, os.path.abspath(__file__), '--case', str(size), state,
+                       '--mcs', str(args.mcs), '--warmup', str(args.warmup)]
+            if args.config:
+                command += ['--config', args.config]
+            case = json.loads(subprocess.check_output(command).decode().strip().splitlines()[-1])
+            print('%5i %-6s %8i cells %9.2f ms/MCS %12.0f cells/s %8.1f MB' % (
+                size, state, case['Cells'], 1e3 * case['SecondsPerMCS'], case['CellsPerSecond'], case['PeakRSSMB']))
+            cases.append(case)
+
+    results = {
+        'Commit': git_commit(),
+        'Date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'Python': platform.python_version(),
+        'NumPy': np.__version__,
+        'Machine': platform.machine(),
+        'Config': config,
+        'Cases': cases,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
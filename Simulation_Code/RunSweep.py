@@ -0,0 +1,143 @@
+import argparse
+import itertools
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Simulation'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data'))
+from OutputWriter import load_output
+from SweepStore import SweepStore
+
+# Headless runs of IFNModel.cc3d over a parameter grid, e.g.
+#   python RunSweep.py k31 --values 1 5 10 50 100 --replicates 20 --output ../Data/Fig5/Data
+#   python RunSweep.py dcs --values 5 10 15 --values 1 2 3 --replicates 20 --output ../Data/Fig8/Data
+# Each run writes into a scratch folder and its files are moved to the output folder only once the
+# run has finished, so a crashed sweep is resumed by running the same command again.
+# With --store, finished runs are also appended to one SweepStore per output (<output>/<Output>_<sweep>.npy).
+
+simulation_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'IFNModel.cc3d')
+output_files = ['FullModelCellular', 'FullModelIntracellular', 'PlaqueAssay']
+
+
+def run_name(sweep, values, replicate):
+    return '%s_%s_%i' % (sweep, '_'.join('%.2f' % v for v in values), replicate)
+
+
+def is_done(output, name, output_format):
+    return all(os.path.exists(os.path.join(output, '%s_%s.%s' % (f, name, output_format))) for f in output_files)
+
+
+def run_simulation(command, sweep, values, replicate, seed, output, output_format):
+    name = run_name(sweep, values, replicate)
+    scratch = os.path.join(output, '.running', name)
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+
+    env = dict(os.environ)
+    env['IFNMODEL_SWEEP'] = sweep
+    env['IFNMODEL_VALUES'] = ','.join(repr(v) for v in values)
+    env['IFNMODEL_REPLICATE'] = str(replicate)
+    env['IFNMODEL_SEED'] = str(seed)
+    env['IFNMODEL_OUTPUTFOLDER'] = scratch
+    env['IFNMODEL_OUTPUTFORMAT'] = output_format
+    with open(os.path.join(scratch, 'run.log'), 'w') as log:
+        returncode = subprocess.call(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    if returncode != 0 or not is_done(scratch, name, output_format):
+        return name, False
+    for f in output_files:
+        file_name = '%s_%s.%s' % (f, name, output_format)
+        os.replace(os.path.join(scratch, file_name), os.path.join(output, file_name))
+    shutil.rmtree(scratch)
+    return name, True
+
+
+def read_run(path):
+    if path.endswith('.npy'):
+        return load_output(path)
+    with open(path) as f:
+        columns = f.readline().strip().split(',')
+    return np.rec.fromarrays(np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2).T, names=columns)
+
+
+def append_to_stores(output, sweep, values, replicate, output_format, sweep_values, replicates, times):
+    name = run_name(sweep, values, replicate)
+    for f in output_files:
+        run = read_run(os.path.join(output, '%s_%s.%s' % (f, name, output_format)))
+        path = os.path.join(output, '%s_%s' % (f, sweep))
+        if os.path.exists(path + '.npy'):
+            store = SweepStore(path, mode='r+')
+        else:
+            store = SweepStore.create(path, sweep_values, replicates, times, run.dtype.names)
+        store.write(values, replicate, run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parameter sweep of the IFN model')
+    parser.add_argument('sweep', help='k11, k31, k71, beta, idc or dcs (see sweeps in Simulation/ModelParameters.py)')
+    parser.add_argument('--values', type=float, nargs='+', action='append', required=True,
+                        help='Multipliers of a swept parameter, repeat for sweeps over two parameters')
+    parser.add_argument('--replicates', type=int, default=20)
+    parser.add_argument('--first-replicate', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--output-format', default='txt', choices=['txt', 'npy'])
+    parser.add_argument('--store', action='store_true', help='Append finished runs to the sweep stores')
+    parser.add_argument('--times', type=int, default=480, help='Output rows kept per run in the sweep stores')
+    parser.add_argument('--command', default='%s -m cc3d.run_script -i %s' % (sys.executable, simulation_file),
+                        help='Command running one headless simulation')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    replicates = range(args.first_replicate, args.first_replicate + args.replicates)
+    sweep_values = list(itertools.product(*args.values))
+    runs = [(values, r) for values in sweep_values for r in replicates]
+    jobs = [(values, r) for values, r in runs if not is_done(output, run_name(args.sweep, values, r),
+                                                             args.output_format)]
+    print('%i runs to do' % len(jobs))
+
+    def store(values, r):
+        append_to_stores(output, args.sweep, values, r, args.output_format, sweep_values, replicates, args.times)
+
+    if args.store:
+        # Stores of an earlier, smaller grid are extended to this one before any run is written
+        for f in output_files:
+            path = os.path.join(output, '%s_%s' % (f, args.sweep))
+            if os.path.exists(path + '.npy'):
+                SweepStore(path).extend(sweep_values, replicates)
+
+        # Runs finished before the stores were in use (or before a crash)
+        path = os.path.join(output, '%s_%s' % (output_files[0], args.sweep))
+        stored = SweepStore(path) if os.path.exists(path + '.npy') else None
+        for values, r in runs:
+            if (values, r) not in jobs and (stored is None or np.isnan(
+                    stored.data[stored.value_index(values), stored.replicates.index(r)]).all()):
+                store(values, r)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # Each worker thread waits on its own simulation process
+        futures = {pool.submit(run_simulation, shlex.split(args.command), args.sweep, values, r, args.seed, output,
+                               args.output_format): (values, r) for values, r in jobs}
+        for i, future in enumerate(as_completed(futures)):
+            name, ok = future.result()
+            print('[%i/%i] %s %s' % (i + 1, len(jobs), name, 'done' if ok else 'FAILED'))
+            if not ok:
+                failed.append(name)
+            elif args.store:
+                store(*futures[future])
+
+    if failed:
+        print('%i runs failed, logs in %s' % (len(failed), os.path.join(output, '.running')))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
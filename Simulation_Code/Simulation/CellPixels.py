@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class CellPixelIndex:
+    # Pixels owned by each cell as flat indices into a field of the lattice shape, in CSR form:
+    # pixels[starts[c]:starts[c + 1]] are the pixels of cell c and pixel_cells the cell of each of them.
+    # Cells are frozen, so the index is built once at start and shared by the fields and steppables.
+    def __init__(self, labels):
+        # labels[x, y]: index of the cell at each pixel (-1 for medium)
+        labels = np.asarray(labels)
+        self.shape = labels.shape
+        flat_labels = labels.ravel()
+        pixels = np.argsort(flat_labels, kind='stable')
+        self.pixels = pixels[flat_labels[pixels] >= 0]
+        self.pixel_cells = flat_labels[self.pixels]
+        self.number_cells = int(flat_labels.max()) + 1
+        self.volumes = np.bincount(self.pixel_cells, minlength=self.number_cells)
+        self.starts = np.concatenate([[0], np.cumsum(self.volumes)])
+        self.contiguous = bool(np.all(self.volumes > 0))
+
+    @classmethod
+    def from_cells(cls, cells, shape, pixel_list):
+        # Index of CC3D cells (indexed by cell.dict['Index']), pixel_list is SteppableBasePy.get_cell_pixel_list
+        labels = np.full(shape, -1)
+        for cell in cells:
+            for ptd in pixel_list(cell):
+                labels[ptd.pixel.x, ptd.pixel.y] = cell.dict['Index']
+        return cls(labels)
+
+    def sum(self, field):
+        # Total of the field over the pixels of each cell
+        values = field.ravel()[self.pixels]
+        if self.contiguous:
+            return np.add.reduceat(values, self.starts[:-1])
+        return np.bincount(self.pixel_cells, weights=values, minlength=self.number_cells)
+
+    def scatter(self, field, indices, amounts):
+        # Adds amounts[i] to the field spread evenly over the pixels of cell indices[i]
+        indices = np.asarray(indices)
+        volumes = self.volumes[indices]
+        # Positions in pixels of the pixels of the given cells, cell after cell
+        positions = np.repeat(self.starts[indices] - np.cumsum(volumes) + volumes, volumes) + np.arange(volumes.sum())
+        np.add.at(field.ravel(), self.pixels[positions], np.repeat(np.asarray(amounts, dtype=float) / volumes, volumes))
+
+    def subset(self, cells):
+        # pixels, starts and pixel_cells of the given cells only, numbered 0..len(cells) - 1
+        cells = np.asarray(cells)
+        volumes = self.volumes[cells]
+        ends = np.cumsum(volumes)
+        positions = np.repeat(self.starts[cells] - ends + volumes, volumes) + np.arange(ends[-1] if ends.size else 0)
+        return self.pixels[positions], np.concatenate([[0], ends]), np.repeat(np.arange(cells.size), volumes)
@@ -0,0 +1,40 @@
+import numpy as np
+from FieldSolver import FieldSolver
+
+
+class FieldSampler:
+    # Per-MCS cache of the amount of each field seen by every cell.
+    # A field is read once per MCS into an array indexed by cell.dict['Index'];
+    # secretion done through the sampler is added to the cached amounts, so
+    # later readers in the same MCS see the field as if it had been re-read.
+    # secretors are CC3D field secretors or FieldSolver instances.
+    def __init__(self, cells, secretors):
+        self.cells = list(cells)
+        self.secretors = secretors
+        self.amounts = {}
+        self.sampled_mcs = {}
+
+    def sample(self, name, mcs):
+        if self.sampled_mcs.get(name) != mcs:
+            secretor = self.secretors[name]
+            if isinstance(secretor, FieldSolver):
+                amounts = secretor.amounts_seen()
+            else:
+                amounts = np.zeros(len(self.cells))
+                for cell in self.cells:
+                    amounts[cell.dict['Index']] = secretor.amountSeenByCell(cell)
+            self.amounts[name] = amounts
+            self.sampled_mcs[name] = mcs
+        return self.amounts[name]
+
+    def secrete_cells(self, name, indices, amounts):
+        # secreteInsideCellTotalCount(cell, amounts[i]) of the cells indices[i] (unique indices),
+        # as one scatter with a FieldSolver
+        secretor = self.secretors[name]
+        if isinstance(secretor, FieldSolver):
+            secretor.secrete_cells(indices, amounts)
+        else:
+            for index, amount in zip(indices, amounts):
+                secretor.secreteInsideCellTotalCount(self.cells[index], amount)
+        if name in self.amounts:
+            self.amounts[name][indices] += amounts
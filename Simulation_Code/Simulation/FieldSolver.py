@@ -0,0 +1,65 @@
+import numpy as np
+
+# Explicit Euler with the 5-point stencil and decay in 2D is stable for dt * (8 * diffusion + decay) <= 2,
+# i.e. dt * (4 * diffusion + decay / 2) <= 1 (lattice units), kept below with a margin
+stencil_limit = 0.9
+
+
+def diffusion_substeps(diffusion, decay=0.0, limit=stencil_limit):
+    # Number of explicit substeps per MCS keeping each substep below the stability limit
+    return max(1, int(np.ceil((4.0 * diffusion + decay / 2.0) / limit)))
+
+
+class FieldSolver:
+    # Diffusion with first order decay of one field on a periodic 2D lattice,
+    #   dc/dt = diffusion * laplacian(c) - decay * c    (lattice units, one MCS per step)
+    # as a replacement of DiffusionSolverFE for this model. 'stencil' integrates the 5-point stencil with
+    # explicit substeps, 'spectral' integrates the same discrete operator exactly with a real FFT.
+    # Cells see and secrete into the field through their pixels (a CellPixelIndex) like amountSeenByCell
+    # and secreteInsideCellTotalCount.
+    def __init__(self, index, diffusion, decay, method='stencil'):
+        if method not in ['stencil', 'spectral']:
+            raise ValueError('Unknown field solver %s' % method)
+        self.index = index
+        self.field = np.zeros(index.shape)
+        self.method = method
+        self.diffusion = diffusion
+        self.decay = decay
+        self.substeps = diffusion_substeps(diffusion, decay)
+
+        if method == 'spectral':
+            # Eigenvalues of the periodic 5-point laplacian over the rfft2 modes
+            nx, ny = index.shape
+            kx = 2.0 * np.cos(2.0 * np.pi * np.fft.fftfreq(nx)) - 2.0
+            ky = 2.0 * np.cos(2.0 * np.pi * np.fft.rfftfreq(ny)) - 2.0
+            self.propagator = np.exp(diffusion * (kx[:, None] + ky[None, :]) - decay)
+
+    def step(self, region=None):
+        # region (x0, x1, y0, y1): only integrates the stencil over field[x0:x1, y0:y1], which must not touch
+        # the edges of the lattice. The pixels around it are read but not updated, so they should be ~0.
+        if self.method == 'spectral':
+            if region is not None:
+                raise ValueError('The spectral field solver integrates the whole lattice')
+            self.field = np.fft.irfft2(np.fft.rfft2(self.field) * self.propagator, s=self.field.shape)
+            return
+        dt = 1.0 / self.substeps
+        c = self.field
+        if region is not None:
+            x0, x1, y0, y1 = region
+            interior = c[x0:x1, y0:y1]
+            for _ in range(self.substeps):
+                laplacian = c[x0 - 1:x1 - 1, y0:y1] + c[x0 + 1:x1 + 1, y0:y1] + c[x0:x1, y0 - 1:y1 - 1] \
+                            + c[x0:x1, y0 + 1:y1 + 1] - 4.0 * interior
+                interior += dt * (self.diffusion * laplacian - self.decay * interior)
+            return
+        for _ in range(self.substeps):
+            laplacian = np.roll(c, 1, 0) + np.roll(c, -1, 0) + np.roll(c, 1, 1) + np.roll(c, -1, 1) - 4.0 * c
+            c += dt * (self.diffusion * laplacian - self.decay * c)
+
+    def amounts_seen(self):
+        # Total of the field over the pixels of each cell
+        return self.index.sum(self.field)
+
+    def secrete_cells(self, indices, amounts):
+        # Adds amounts[i] to the field, spread evenly over the pixels of cell indices[i]
+        self.index.scatter(self.field, indices, amounts)
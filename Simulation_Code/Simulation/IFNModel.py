@@ -1,15 +1,19 @@
 from cc3d import CompuCellSetup
+from RunConfiguration import RunConfiguration
+
+# Run settings shared by all steppables (see RunConfiguration.py)
+config = RunConfiguration.load()
         
 from IFNModelSteppables import ODEModelSteppable
-CompuCellSetup.register_steppable(steppable=ODEModelSteppable(frequency=1))
+CompuCellSetup.register_steppable(steppable=ODEModelSteppable(frequency=1, config=config))
 
 from IFNModelSteppables import CellularModelSteppable
-CompuCellSetup.register_steppable(steppable=CellularModelSteppable(frequency=1))
+CompuCellSetup.register_steppable(steppable=CellularModelSteppable(frequency=1, config=config))
 
 from IFNModelSteppables import PlaqueAssaySteppable
-CompuCellSetup.register_steppable(steppable=PlaqueAssaySteppable(frequency=1))
+CompuCellSetup.register_steppable(steppable=PlaqueAssaySteppable(frequency=1, config=config))
 
 from IFNModelSteppables import OutputSteppable
-CompuCellSetup.register_steppable(steppable=OutputSteppable(frequency=1))
+CompuCellSetup.register_steppable(steppable=OutputSteppable(frequency=1, config=config))
 
 CompuCellSetup.run()
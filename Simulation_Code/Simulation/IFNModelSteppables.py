@@ -1,23 +1,19 @@
 from cc3d.core.PySteppables import *
 import numpy as np
 import os
-import Parameters
-
-IFNWash = False  # Whether the plate is prestimulated with IFNe before infection
-
-min_to_mcs = 10.0  # min/mcs
-hours_to_mcs = min_to_mcs / 60.0  # hours/mcs
-days_to_mcs = min_to_mcs / 1440.0  # day/mcs
-hours_to_simulate = 80.0  # 10 in the original model
-
-virus_diffusion_coefficient = 1.0 / 10.0  # vl^2 / min
-IFNe_diffusion_coefficient = 1.0 / 10.0  # vl^2 / min
-
-Replicate = Parameters.R
-
-folder_path = '/Users/joaponte/Desktop/IFNModel/'
-if not os.path.exists(folder_path):
-    os.makedirs(folder_path)
+from RunConfiguration import RunConfiguration
+from IntracellularModel import BatchedIntracellularModel, viral_parameters
+from ModelParameters import t2, sweep_multipliers, intracellular_value
+from FieldSampling import FieldSampler
+from CellPixels import CellPixelIndex
+from FieldSolver import FieldSolver
+from Transitions import draw_transitions
+from RandomStreams import simulation_rng
+from OutputWriter import OutputWriter, output_species, summary_statistics, plaque_radii, intracellular_means, \
+    intracellular_summary
+from OutputSchedule import OutputSchedule
+from Profiling import Profiler
+from MultiRate import MultiRateSchedule, IntracellularClock
 
 # Cell Transition Model
 FluModel_string = '''        
@@ -100,218 +96,489 @@ IFN_model_string = '''
     V = 0.0         ;
 '''
 
-## Global Parameters
-# IFN Decay Rate
-t2 = 3.481
+# Coupled Viral Replication and IFN Model (shared V, H and IFNe)
+intracellular_model_string = '''
+    //Equations
+    E2a: -> IFN         ; H*(k11*RIGI*V+k12*(V^n)/(k13+(V^n))+k14*IRF7P)    ;
+    E2b: IFN ->         ; k21*IFN                                           ;
+    E4a: -> STATP       ; H*k31*IFNe/(k32+k33*IFNe)                         ;
+    E4b: STATP ->       ; t3*STATP                                          ;
+    E5a: -> IRF7        ; H*(k41*STATP+k42*IRF7P)                           ;
+    E5b: IRF7 ->        ; t4*IRF7                                           ;
+    E6a: -> IRF7P       ; H*k51*IRF7                                        ;
+    E6b: IRF7P ->       ; t5*IRF7P                                          ;
+    E7a: H ->           ; H*k61*V                                           ;
+    E8a: -> V           ; H*k71*V/(1.0+k72*IFNe*7E-5)                       ;
+    E8b: V ->           ; k73*V                                             ;
+
+    //Parameters
+    // k11 = 10.0^(5)  ; 
+    k11 = 0.0       ; 
+    k12 = 9.746     ; 
+    k13 = 12.511    ; 
+    k14 = 13.562    ;
+    k21 = 10.385    ;
+    k31 = 45.922    ;
+    k32 = 5.464     ;
+    k33 = 0.068     ;
+    t3  = 0.3       ;
+    k41 = 0.115     ;
+    k42 = 1.053     ;
+    t4  = 0.75      ;
+    k51 = 0.202     ;
+    t5  = 0.3       ;
+    n   = 3.0       ;
+    RIGI = 1.0      ;
+    k61 = 0.635     ;
+    k71 = 1.537     ;
+    k72 = 47.883    ;
+    k73 = 0.197     ;
+
+    //Initial Conditions
+    V =  0.0      ; 
+    H = 1.0          ;
+
+    // Inputs
+    IFNe = 0.0      ;
+'''
+
+
+def viral_model(cell, config):
+    # SBML model holding the viral species (V, H) of a cell
+    if config.IntracellularSolver == 'Fused':
+        return cell.sbml.IModel
+    return cell.sbml.VModel
+
 
 class ODEModelSteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, config=None):
         SteppableBasePy.__init__(self, frequency)
+        self.config = config or RunConfiguration.load()
 
     def start(self):
+        # Settings of the batched engine have no effect on the SBML models of the other solvers
+        if self.config.IntracellularSolver != 'Batched':
+            batched_only = {'IntracellularStep': self.config.IntracellularStep > 0,
+                            'IntracellularIntegrator': self.config.IntracellularIntegrator != 'RK4',
+                            'LinearFastPath': self.config.LinearFastPath}
+            unsupported = [name for name, is_set in batched_only.items() if is_set]
+            if unsupported:
+                raise ValueError('%s need the Batched intracellular solver, not %s'
+                                 % (', '.join(unsupported), self.config.IntracellularSolver))
+
+        # Timers of the phases of each MCS, shared by the steppables
+        self.profiler = Profiler(self.config.Profile)
+        self.shared_steppable_vars['Profiler'] = self.profiler
+
         # Store Initial Number of Cells
         self.shared_steppable_vars['InitialNumberCells'] = len(self.cell_list)
 
-        # Set Max Simulation Steps
-        self.get_xml_element('simulation_steps').cdata = hours_to_simulate / hours_to_mcs
+        # Index cells for per-cell arrays
+        cells = list(self.cell_list)
+        for index, cell in enumerate(cells):
+            cell.dict['Index'] = index
+        self.shared_steppable_vars['Cells'] = cells
 
-        # Load Original FLU ODE Model
-        self.add_free_floating_antimony(model_string=FluModel_string, model_name='FluModel',
-                                        step_size=days_to_mcs)
+        # Random stream of this simulation
+        self.shared_steppable_vars['RNG'] = simulation_rng(self.config.Sweep, self.config.Values,
+                                                           self.config.Replicate, self.config.Seed)
 
-        # Load Viral Model inside Cells
-        self.add_antimony_to_cell_types(model_string=viral_model_string, model_name='VModel',
-                                        cell_types=[self.U], step_size=hours_to_mcs)
+        # Set Max Simulation Steps
+        self.get_xml_element('simulation_steps').cdata = \
+            self.config.hours_to_simulate / self.config.hours_to_mcs
 
-        # Load IFN Model inside Cells
-        self.add_antimony_to_cell_types(model_string=IFN_model_string, model_name='IModel',
-                                        cell_types=[self.U], step_size=hours_to_mcs)
+        # Load Original FLU ODE Model, stepped at its own rate (FluStep)
+        flu_schedule = MultiRateSchedule(self.config.FluStep, self.config.min_to_mcs)
+        self.shared_steppable_vars['FluSchedule'] = flu_schedule
+        self.add_free_floating_antimony(model_string=FluModel_string, model_name='FluModel',
+                                        step_size=self.config.days_to_mcs * flu_schedule.mcs_per_step)
+
+        if self.config.IntracellularSolver == 'Batched':
+            # Load Viral and IFN Models of all cells into one batched engine
+            self.shared_steppable_vars['IntracellularModel'] = \
+                BatchedIntracellularModel(self.shared_steppable_vars['InitialNumberCells'],
+                                          self.config.hours_to_mcs, self.config.LinearFastPath,
+                                          self.config.IntracellularIntegrator, self.config.IntracellularRtol,
+                                          self.config.IntracellularAtol)
+            # Stepped at its own rate (IntracellularStep)
+            self.shared_steppable_vars['IntracellularClock'] = \
+                IntracellularClock(self.shared_steppable_vars['IntracellularModel'],
+                                   MultiRateSchedule(self.config.IntracellularStep, self.config.min_to_mcs),
+                                   self.config.hours_to_mcs)
+        elif self.config.IntracellularSolver == 'Fused':
+            # Load coupled Viral and IFN Model inside Cells
+            self.add_antimony_to_cell_types(model_string=intracellular_model_string, model_name='IModel',
+                                            cell_types=[self.U], step_size=self.config.hours_to_mcs)
+        else:
+            # Load Viral Model inside Cells
+            self.add_antimony_to_cell_types(model_string=viral_model_string, model_name='VModel',
+                                            cell_types=[self.U], step_size=self.config.hours_to_mcs)
+
+            # Load IFN Model inside Cells
+            self.add_antimony_to_cell_types(model_string=IFN_model_string, model_name='IModel',
+                                            cell_types=[self.U], step_size=self.config.hours_to_mcs)
+
+        # Swept parameters
+        for name, multiplier in sweep_multipliers(self.config).items():
+            if name == 'beta':
+                self.sbml.FluModel['beta'] = self.sbml.FluModel['beta'] * multiplier
+            elif name in ['k11', 'k31', 'k71']:
+                value = intracellular_value(name, multiplier)
+                if self.config.IntracellularSolver == 'Batched':
+                    self.shared_steppable_vars['IntracellularModel'].parameters[name] = value
+                else:
+                    for cell in self.cell_list:
+                        if name in viral_parameters:
+                            viral_model(cell, self.config)[name] = value
+                        else:
+                            cell.sbml.IModel[name] = value
 
         # Initial conditions: infected cell in the center
         cell = self.cell_field[self.dim.x // 2, self.dim.y // 2, 0]
         cell.type = self.I1
-        cell.sbml.VModel['V'] = 6.9e-8
+        if self.config.IntracellularSolver == 'Batched':
+            self.shared_steppable_vars['IntracellularModel']['V'][cell.dict['Index']] = 6.9e-8
+        else:
+            viral_model(cell, self.config)['V'] = 6.9e-8
         self.sbml.FluModel['I1'] = 1.0 / self.shared_steppable_vars['InitialNumberCells']
         self.sbml.FluModel['V'] = 0.0
 
         # Set prestimulated internal protein values
-        if IFNWash:
+        if self.config.IFNWash and self.config.IntracellularSolver == 'Batched':
+            model = self.shared_steppable_vars['IntracellularModel']
+            model['IFN'] = 0.035
+            model['IRF7'] = 0.097
+            model['IRF7P'] = 0.028
+            model['STATP'] = 0.714
+        elif self.config.IFNWash:
             for cell in self.cell_list_by_type(self.U, self.I1):
                 cell.sbml.IModel['IFN'] = 0.035
                 cell.sbml.IModel['IRF7'] = 0.097
                 cell.sbml.IModel['IRF7P'] = 0.028
                 cell.sbml.IModel['STATP'] = 0.714
 
+    def finish(self):
+        if self.config.IntracellularSolver == 'Batched' and self.config.IntracellularIntegrator == 'Adaptive':
+            print(self.shared_steppable_vars['IntracellularModel'].step_report())
+        if self.config.Profile:
+            os.makedirs(self.config.OutputFolder, exist_ok=True)
+            self.profiler.save(os.path.join(self.config.OutputFolder, 'Profile_%s.txt' % self.config.run_name))
+            print(self.profiler.report())
+
 
 class CellularModelSteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, config=None):
         SteppableBasePy.__init__(self, frequency)
+        self.config = config or RunConfiguration.load()
 
     def start(self):
-        # Set IFNe diffusion parameters
-        self.get_xml_element('IFNe_dc').cdata = IFNe_diffusion_coefficient * min_to_mcs
-        self.get_xml_element('IFNe_decay').cdata = t2 * hours_to_mcs
+        multipliers = sweep_multipliers(self.config)
+
+        IFNe_dc = self.config.IFNe_diffusion_coefficient * multipliers.get('IFNe_dc', 1.0) * self.config.min_to_mcs
+        IFNe_decay = t2 * self.config.hours_to_mcs
+        virus_dc = self.config.virus_diffusion_coefficient * multipliers.get('virus_dc', 1.0) * self.config.min_to_mcs
+        virus_decay = self.sbml.FluModel['c'] * self.config.days_to_mcs
+        self.cells = self.shared_steppable_vars['Cells']
+
+        # Pixels of each cell, fixed since cells are frozen
+        self.index = CellPixelIndex.from_cells(self.cells, (self.dim.x, self.dim.y), self.get_cell_pixel_list)
+        self.shared_steppable_vars['CellPixelIndex'] = self.index
+
+        if self.config.FieldSolver == 'CC3D':
+            # Set IFNe diffusion parameters
+            self.get_xml_element('IFNe_dc').cdata = IFNe_dc
+            self.get_xml_element('IFNe_decay').cdata = IFNe_decay
+
+            # Set Virus diffusion parameters
+            self.get_xml_element('virus_dc').cdata = virus_dc
+            self.get_xml_element('virus_decay').cdata = virus_decay
+
+            # Set secretors
+            self.secretorIFN = self.get_field_secretor("IFNe")
+            self.secretorV = self.get_field_secretor("Virus")
+            self.solvers = []
+        else:
+            # Fields solved in NumPy (see FieldSolver.py), DiffusionSolverFE is left with nothing to do
+            for name in ['IFNe_dc', 'IFNe_decay', 'virus_dc', 'virus_decay']:
+                self.get_xml_element(name).cdata = 0.0
+            self.secretorIFN = FieldSolver(self.index, IFNe_dc, IFNe_decay, self.config.FieldSolver)
+            self.secretorV = FieldSolver(self.index, virus_dc, virus_decay, self.config.FieldSolver)
+            self.solvers = [self.secretorIFN, self.secretorV]
+
+        # Fields are read once per MCS and shared with the other steppables
+        self.sampler = FieldSampler(self.cells, {'IFNe': self.secretorIFN, 'Virus': self.secretorV})
+        self.shared_steppable_vars['FieldSampler'] = self.sampler
+
+        # Cell types by index, kept in sync by the transition stage
+        self.types = np.array([cell.type for cell in self.cells])
+        self.shared_steppable_vars['CellTypes'] = self.types
+
+        # Cells do not move or grow, counts and volume totals by type are updated at each transition
+        self.volumes = self.index.volumes.astype(float)
+        self.type_counts = {cell_type: int(np.sum(self.types == cell_type))
+                            for cell_type in [self.U, self.I1, self.I2, self.DEAD]}
+        self.type_volumes = {cell_type: np.sum(self.volumes[self.types == cell_type])
+                             for cell_type in [self.U, self.I1, self.I2, self.DEAD]}
+        self.shared_steppable_vars['TypeCounts'] = self.type_counts
+        self.shared_steppable_vars['TypeVolumes'] = self.type_volumes
+
+        # Output steps are decided at the start of each MCS and shared as OutputStep
+        self.schedule = OutputSchedule(self.config.OutputCadence,
+                                       int(self.config.hours_to_simulate / self.config.hours_to_mcs) - 1,
+                                       self.config.OutputInterval, self.config.OutputPoints,
+                                       self.config.OutputThreshold)
+
+    def change_type(self, indices, old_type, new_type):
+        for index in indices:
+            self.cells[index].type = new_type
+        self.types[indices] = new_type
+        self.type_counts[old_type] -= len(indices)
+        self.type_counts[new_type] += len(indices)
+        volume = np.sum(self.volumes[indices])
+        self.type_volumes[old_type] -= volume
+        self.type_volumes[new_type] += volume
+
+    def check_type_totals(self, mcs):
+        # Compares the running counts and volumes by type with a recount of the cell lists
+        for cell_type in self.type_counts:
+            cells = self.cell_list_by_type(cell_type)
+            count = len(cells)
+            volume = sum(cell.volume for cell in cells)
+            if count != self.type_counts[cell_type] or volume != self.type_volumes[cell_type]:
+                raise RuntimeError('MCS %i: cell type %i has %i cells of volume %g, counted %i of volume %g'
+                                   % (mcs, cell_type, count, volume, self.type_counts[cell_type],
+                                      self.type_volumes[cell_type]))
 
-        # Set Virus diffusion parameters
-        self.get_xml_element('virus_dc').cdata = virus_diffusion_coefficient * min_to_mcs
-        self.get_xml_element('virus_decay').cdata = self.sbml.FluModel['c'] * days_to_mcs
+    def step(self, mcs):
+        # Time since the last steppable of the previous MCS, spent in CC3D (Potts, DiffusionSolverFE)
+        profiler = self.shared_steppable_vars['Profiler']
+        profiler.since('End of MCS', 'CC3D: Potts and DiffusionSolverFE')
 
-        # Set secretors
-        self.secretorIFN = self.get_field_secretor("IFNe")
-        self.secretorV = self.get_field_secretor("Virus")
+        batched = self.config.IntracellularSolver == 'Batched'
+        if batched:
+            model = self.shared_steppable_vars['IntracellularModel']
+
+        fractions = [self.type_counts[cell_type] / self.shared_steppable_vars['InitialNumberCells']
+                     for cell_type in [self.U, self.I1, self.I2, self.DEAD]]
+        output_step = self.schedule.is_output_step(mcs, fractions)
+        self.shared_steppable_vars['OutputStep'] = output_step
+
+        # Diffusion and decay, done by DiffusionSolverFE before the steppables with the CC3D solver
+        with profiler.phase('Cellular: Diffusion'):
+            for solver in self.solvers:
+                solver.step()
 
-    def step(self, mcs):
         ## Measure amount of IFNe in the Field
-        self.shared_steppable_vars['ExtracellularIFN_Field'] = 0
-        for cell in self.cell_list_by_type(self.U, self.I1, self.I2):
-            self.shared_steppable_vars['ExtracellularIFN_Field'] += self.secretorIFN.amountSeenByCell(cell)
+        with profiler.phase('Cellular: Field measurement'):
+            IFNe_Field = self.sampler.sample('IFNe', mcs)
+            if output_step:
+                self.shared_steppable_vars['ExtracellularIFN_Field'] = \
+                    np.sum(IFNe_Field[self.types != self.DEAD])
 
         ## Production of IFNe
-        # E2b: IFN -> IFNe; k21 * IFN ;
-        for cell in self.cell_list_by_type(self.U, self.I1, self.I2):
-            intracellularIFN = cell.sbml.IModel['IFN']
-            k21 = cell.sbml.IModel['k21'] * hours_to_mcs
-            p = k21 * intracellularIFN
-            self.secretorIFN.secreteInsideCellTotalCount(cell, p / cell.volume)
+        with profiler.phase('Cellular: Secretion'):
+            # E2b: IFN -> IFNe; k21 * IFN ;
+            live = np.flatnonzero(self.types != self.DEAD)
+            if batched:
+                p = model.parameters['k21'] * self.config.hours_to_mcs * model['IFN'][live]
+            else:
+                p = np.array([self.cells[i].sbml.IModel['k21'] * self.config.hours_to_mcs
+                              * self.cells[i].sbml.IModel['IFN'] for i in live])
+            self.sampler.secrete_cells('IFNe', live, p / self.volumes[live])
 
         ## Measure amount of extracellular virus field
-        self.shared_steppable_vars['ExtracellularVirus_Field'] = 0
-        for cell in self.cell_list:
-            V = self.secretorV.amountSeenByCell(cell)
-            self.shared_steppable_vars['ExtracellularVirus_Field'] += V
+        with profiler.phase('Cellular: Field measurement'):
+            Virus_Field = self.sampler.sample('Virus', mcs)
+            if output_step:
+                self.shared_steppable_vars['ExtracellularVirus_Field'] = np.sum(Virus_Field)
 
         ## Production of extracellular virus
-        # E8b: V -> ; k73 * V
-        for cell in self.cell_list_by_type(self.I2):
-            k73 = cell.sbml.VModel['k73'] * hours_to_mcs
-            Virus = cell.sbml.VModel['V']
-            p = k73 * Virus * 1094460.28
-            self.secretorV.secreteInsideCellTotalCount(cell, p / cell.volume)
-
-        ## P to D transition
-        # E7a: P -> ; P * k61 * V;
-        for cell in self.cell_list_by_type(self.I2):
-            k61 = cell.sbml.VModel['k61'] * hours_to_mcs
-            H = cell.sbml.VModel['H']
-            V = cell.sbml.VModel['V']
-            r = k61 * V * (1 - H)
-            p_I2toD = 1.0 - np.exp(-r)
-            if np.random.random() < p_I2toD:
-                cell.type = self.DEAD
-
-        ## I1 to I2 transition
-        # E2: I1 -> I2 ; k * I1
-        for cell in self.cell_list_by_type(self.I1):
-            k = self.sbml.FluModel['k'] * days_to_mcs
-            r = k
-            p_T1oI2 = 1.0 - np.exp(-r)
-            if np.random.random() < p_T1oI2:
-                cell.type = self.I2
-
-        ## U to I1 transition
-        # E1: T -> I1 ; beta * V * T
-        for cell in self.cell_list_by_type(self.U):
-            b = self.sbml.FluModel['beta'] * self.shared_steppable_vars['InitialNumberCells'] * days_to_mcs
-            V = self.secretorV.amountSeenByCell(cell)
-            r = b * V
-            p_UtoI1 = 1.0 - np.exp(-r)
-            if np.random.random() < p_UtoI1:
-                cell.type = self.I1
-                cell.sbml.VModel['V'] = 6.9e-8
+        with profiler.phase('Cellular: Secretion'):
+            # E8b: V -> ; k73 * V
+            infected = np.flatnonzero(self.types == self.I2)
+            if batched:
+                p = model.parameters['k73'] * self.config.hours_to_mcs * model['V'][infected] * 1094460.28
+            else:
+                p = np.array([viral_model(self.cells[i], self.config)['k73'] * self.config.hours_to_mcs
+                              * viral_model(self.cells[i], self.config)['V'] * 1094460.28 for i in infected])
+            self.sampler.secrete_cells('Virus', infected, p / self.volumes[infected])
+
+        ## Cell state transitions
+        with profiler.phase('Cellular: Transitions'):
+            # All cells are drawn at once from their types at the start of the step
+            U = np.flatnonzero(self.types == self.U)
+            I1 = np.flatnonzero(self.types == self.I1)
+            I2 = np.flatnonzero(self.types == self.I2)
+
+            # E7a: P -> ; P * k61 * V;
+            if batched:
+                k61 = model.parameters['k61'] * self.config.hours_to_mcs
+                H = model['H'][I2]
+                V = model['V'][I2]
+            else:
+                k61 = viral_model(self.cells[0], self.config)['k61'] * self.config.hours_to_mcs
+                H = np.array([viral_model(self.cells[i], self.config)['H'] for i in I2])
+                V = np.array([viral_model(self.cells[i], self.config)['V'] for i in I2])
+            r_I2toD = k61 * V * (1 - H)
+
+            # E2: I1 -> I2 ; k * I1
+            k = self.sbml.FluModel['k'] * self.config.days_to_mcs
+            r_I1toI2 = np.full(I1.size, k)
+
+            # E1: T -> I1 ; beta * V * T
+            b = self.sbml.FluModel['beta'] * self.shared_steppable_vars['InitialNumberCells'] \
+                * self.config.days_to_mcs
+            r_UtoI1 = b * Virus_Field[U]
+
+            I2toD, I1toI2, UtoI1 = draw_transitions([r_I2toD, r_I1toI2, r_UtoI1],
+                                                    self.shared_steppable_vars['RNG'])
+
+            ## P to D transition
+            self.change_type(I2[I2toD], self.I2, self.DEAD)
+
+            ## I1 to I2 transition
+            self.change_type(I1[I1toI2], self.I1, self.I2)
+
+            ## U to I1 transition
+            self.change_type(U[UtoI1], self.U, self.I1)
+            if batched:
+                model['V'][U[UtoI1]] = 6.9e-8
+            else:
+                for index in U[UtoI1]:
+                    viral_model(self.cells[index], self.config)['V'] = 6.9e-8
+
+            if self.config.ConsistencyCheckInterval and mcs % self.config.ConsistencyCheckInterval == 0:
+                self.check_type_totals(mcs)
 
         ## Updating Cellular Models
-        for cell in self.cell_list:
-            cell.sbml.VModel['IFNe'] = self.secretorIFN.amountSeenByCell(cell)
-            cell.sbml.IModel['IFNe'] = self.secretorIFN.amountSeenByCell(cell)
-            cell.sbml.IModel['H'] = cell.sbml.VModel['H']
-            cell.sbml.IModel['V'] = cell.sbml.VModel['V']
-
-        self.timestep_sbml()
+        with profiler.phase('Cellular: SBML sync'):
+            if batched:
+                model.IFNe[:] = IFNe_Field
+            elif self.config.IntracellularSolver == 'Fused':
+                for cell in self.cell_list:
+                    cell.sbml.IModel['IFNe'] = IFNe_Field[cell.dict['Index']]
+            else:
+                for cell in self.cell_list:
+                    cell.sbml.VModel['IFNe'] = IFNe_Field[cell.dict['Index']]
+                    cell.sbml.IModel['IFNe'] = IFNe_Field[cell.dict['Index']]
+                    cell.sbml.IModel['H'] = cell.sbml.VModel['H']
+                    cell.sbml.IModel['V'] = cell.sbml.VModel['V']
+
+        with profiler.phase('Cellular: timestep_sbml'):
+            flu_schedule = self.shared_steppable_vars['FluSchedule']
+            if flu_schedule.single:
+                self.timestep_sbml()
+            else:
+                self.timestep_cell_sbml()
+                if flu_schedule.due(mcs):
+                    for _ in range(flu_schedule.substeps):
+                        self.timestep_free_floating_sbml()
+        with profiler.phase('Cellular: Intracellular step'):
+            if batched:
+                self.shared_steppable_vars['IntracellularClock'].step()
 
 
 class OutputSteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, config=None):
         SteppableBasePy.__init__(self, frequency)
+        self.config = config or RunConfiguration.load()
 
     def start(self):
+        os.makedirs(self.config.OutputFolder, exist_ok=True)
+
         # Output Cellular Data
-        file_name1 = 'FullModelCellular_%i.txt' % Replicate
-        self.output1 = open(folder_path + file_name1, 'w')
-        self.output1.write("%s,%s,%s,%s,%s,%s,%s\n" % ('Time', 'U', 'I1', 'I2', 'D', 'Ve', 'IFNe'))
-        self.output1.flush()
+        file_name1 = 'FullModelCellular_%s' % self.config.run_name
+        self.output1 = OutputWriter(os.path.join(self.config.OutputFolder, file_name1),
+                                    ['Time', 'U', 'I1', 'I2', 'D', 'Ve', 'IFNe'],
+                                    self.config.OutputFormat, self.config.OutputFlushInterval)
 
         # Output Intracellular Data
-        file_name2 = 'FullModelIntracellular_%i.txt' % Replicate
-        self.output2 = open(folder_path + file_name2, 'w')
-        self.output2.write("%s,%s,%s,%s,%s,%s,%s,%s,%s\n" %
-                           ('Time', 'V', 'H', 'P', 'IFNe', 'STATP', 'IRF7', 'IRF7P', 'IFN'))
-        self.output2.flush()
-
-        # IFNe secretor
-        self.secretorIFNe = self.get_field_secretor("IFNe")
+        file_name2 = 'FullModelIntracellular_%s' % self.config.run_name
+        self.output2 = OutputWriter(os.path.join(self.config.OutputFolder, file_name2),
+                                    ['Time', 'V', 'H', 'P', 'IFNe', 'STATP', 'IRF7', 'IRF7P', 'IFN'],
+                                    self.config.OutputFormat, self.config.OutputFlushInterval)
+
+        # Output spread of the Intracellular Data over live cells
+        if self.config.IntracellularSummary:
+            file_name4 = 'FullModelIntracellularSummary_%s' % self.config.run_name
+            self.output4 = OutputWriter(os.path.join(self.config.OutputFolder, file_name4),
+                                        ['Time'] + ['%s%s' % (name, statistic) for name in output_species
+                                                    for statistic in summary_statistics],
+                                        self.config.OutputFormat, self.config.OutputFlushInterval)
+
+    def intracellular_state(self, live):
+        # (species, cells) array of the output_species of the cells with the given indices
+        if self.config.IntracellularSolver == 'Batched':
+            model = self.shared_steppable_vars['IntracellularModel']
+            return np.array([model[name][live] for name in output_species])
+        cells = [self.shared_steppable_vars['Cells'][index] for index in live]
+        viral_models = [viral_model(cell, self.config) for cell in cells]
+        IFN_models = [cell.sbml.IModel for cell in cells]
+        return np.array([[m[name] for m in (viral_models if name in ['V', 'H'] else IFN_models)]
+                         for name in output_species]).reshape(len(output_species), len(cells))
 
     def step(self, mcs):
-        Time = mcs * hours_to_mcs
-        U = len(self.cell_list_by_type(self.U)) / self.shared_steppable_vars['InitialNumberCells']
-        I1 = len(self.cell_list_by_type(self.I1)) / self.shared_steppable_vars['InitialNumberCells']
-        I2 = len(self.cell_list_by_type(self.I2)) / self.shared_steppable_vars['InitialNumberCells']
-        D = len(self.cell_list_by_type(self.DEAD)) / self.shared_steppable_vars['InitialNumberCells']
+        profiler = self.shared_steppable_vars['Profiler']
+        if self.shared_steppable_vars['OutputStep']:
+            with profiler.phase('Output'):
+                self.write(mcs)
+        # Last steppable of the MCS (see IFNModel.py)
+        profiler.mark('End of MCS')
+
+    def write(self, mcs):
+        Time = mcs * self.config.hours_to_mcs
+        counts = self.shared_steppable_vars['TypeCounts']
+        U = counts[self.U] / self.shared_steppable_vars['InitialNumberCells']
+        I1 = counts[self.I1] / self.shared_steppable_vars['InitialNumberCells']
+        I2 = counts[self.I2] / self.shared_steppable_vars['InitialNumberCells']
+        D = counts[self.DEAD] / self.shared_steppable_vars['InitialNumberCells']
         Ve = self.shared_steppable_vars['ExtracellularVirus_Field']
-        IFNe = 0.0
-        for cell in self.cell_list:
-            IFNe += self.secretorIFNe.amountSeenByCell(cell)
+        IFNe = np.sum(self.shared_steppable_vars['FieldSampler'].sample('IFNe', mcs))
 
-        self.output1.write("%e,%e,%e,%e,%e,%e,%e\n" % (Time, U, I1, I2, D, Ve, IFNe))
-        self.output1.flush()
+        self.output1.write(Time, U, I1, I2, D, Ve, IFNe)
 
-        L = len(self.cell_list_by_type(self.U, self.I1, self.I2))
+        L = counts[self.U] + counts[self.I1] + counts[self.I2]
         P = L / self.shared_steppable_vars['InitialNumberCells']
-        V = 0.0
-        H = 0.0
-        STATP = 0.0
-        IRF7 = 0.0
-        IRF7P = 0.0
-        IFN = 0.0
-        for cell in self.cell_list_by_type(self.U, self.I1, self.I2):
-            V += cell.sbml.VModel['V'] / L
-            H += cell.sbml.VModel['H'] / L
-            STATP += cell.sbml.IModel['STATP'] / L
-            IRF7 += cell.sbml.IModel['IRF7'] / L
-            IRF7P += cell.sbml.IModel['IRF7P'] / L
-            IFN += cell.sbml.IModel['IFN'] / L
+        live = np.flatnonzero(self.shared_steppable_vars['CellTypes'] != self.DEAD)
+        state = self.intracellular_state(live)
+        V, H, STATP, IRF7, IRF7P, IFN = intracellular_means(state)
         IFNe = self.shared_steppable_vars['ExtracellularIFN_Field'] \
                / self.shared_steppable_vars['InitialNumberCells']
-        self.output2.write("%e,%e,%e,%e,%e,%e,%e,%e,%e\n" %
-                           (Time, V, H, P, IFNe, STATP, IRF7, IRF7P, IFN))
-        self.output2.flush()
+        self.output2.write(Time, V, H, P, IFNe, STATP, IRF7, IRF7P, IFN)
+
+        if self.config.IntracellularSummary:
+            self.output4.write(Time, *intracellular_summary(state))
+
+    def finish(self):
+        self.output1.close()
+        self.output2.close()
+        if self.config.IntracellularSummary:
+            self.output4.close()
 
 
 class PlaqueAssaySteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, config=None):
         SteppableBasePy.__init__(self, frequency)
+        self.config = config or RunConfiguration.load()
 
-        file_name3 = 'PlaqueAssay_%i.txt' % Replicate
-        self.output3 = open(folder_path + file_name3, 'w')
-        self.output3.write("%s,%s,%s,%s\n" % ('Time', 'avgI1rd', 'avgI2rd', 'avgDrd'))
-        self.output3.flush()
+        os.makedirs(self.config.OutputFolder, exist_ok=True)
+        file_name3 = 'PlaqueAssay_%s' % self.config.run_name
+        self.output3 = OutputWriter(os.path.join(self.config.OutputFolder, file_name3),
+                                    ['Time', 'avgI1rd', 'avgI2rd', 'avgDrd'],
+                                    self.config.OutputFormat, self.config.OutputFlushInterval)
 
     def step(self, mcs):
+        if self.shared_steppable_vars['OutputStep']:
+            with self.shared_steppable_vars['Profiler'].phase('PlaqueAssay'):
+                self.write(mcs)
+
+    def write(self, mcs):
         # Measure area occupied by D cells and assume its a circle
-        volume_D = 0.0
-        for cell in self.cell_list_by_type(self.DEAD):
-            volume_D += cell.volume
-        avgDrd = np.sqrt(volume_D / np.pi)
-
-        volume_I2 = 0.0
-        for cell in self.cell_list_by_type(self.I2):
-            volume_I2 += cell.volume
-        avgI2rd = np.sqrt((volume_D + volume_I2) / np.pi)
-
-        volume_I1 = 0.0
-        for cell in self.cell_list_by_type(self.I1):
-            volume_I1 += cell.volume
-        avgI1rd = np.sqrt((volume_D + volume_I2 + volume_I1) / np.pi)
-
-        Time = mcs * hours_to_mcs
-        self.output3.write("%e,%e,%e,%e\n" % (Time, avgI1rd, avgI2rd, avgDrd))
-        self.output3.flush()
\ No newline at end of file
+        volumes = self.shared_steppable_vars['TypeVolumes']
+        avgI1rd, avgI2rd, avgDrd = plaque_radii(volumes[self.I1], volumes[self.I2], volumes[self.DEAD])
+
+        Time = mcs * self.config.hours_to_mcs
+        self.output3.write(Time, avgI1rd, avgI2rd, avgDrd)
+
+    def finish(self):
+        self.output3.close()
\ No newline at end of file
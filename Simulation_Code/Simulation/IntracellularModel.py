@@ -0,0 +1,253 @@
+import numpy as np
+
+# Parameters of the Viral Replication Model (viral_model_string)
+viral_parameters = {
+    'k61': 0.635,
+    'k71': 1.537,
+    'k72': 47.883,
+    'k73': 0.197,
+}
+
+# Parameters of the IFN Model (IFN_model_string)
+IFN_parameters = {
+    'k11': 0.0,
+    'k12': 9.746,
+    'k13': 12.511,
+    'k14': 13.562,
+    'k21': 10.385,
+    'k31': 45.922,
+    'k32': 5.464,
+    'k33': 0.068,
+    't3': 0.3,
+    'k41': 0.115,
+    'k42': 1.053,
+    't4': 0.75,
+    'k51': 0.202,
+    't5': 0.3,
+    'n': 3.0,
+    'RIGI': 1.0,
+}
+
+# State variables of the intracellular models, one row per species
+species = ['V', 'H', 'IFN', 'STATP', 'IRF7', 'IRF7P']
+
+# RK4 is stable for h * rate < 2.78 along the real axis, kept below with a margin
+rk4_limit = 2.5
+
+# Dormand-Prince 5(4) pair of the adaptive integrator: stages, 5th order weights and 5th - 4th order weights
+dopri_a = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+dopri_b = [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0.0]
+dopri_e = [71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40]
+
+# Species of the IFN model, linear in cells without virus (V = 0, H = 1)
+linear_species = ['IFN', 'STATP', 'IRF7', 'IRF7P']
+
+
+def expm(A, terms=18):
+    # Matrix exponential by scaling and squaring of the Taylor series, for the small matrices here
+    norm = np.max(np.sum(np.abs(A), axis=1))
+    squarings = int(np.ceil(np.log2(norm))) + 1 if norm > 0.5 else 0
+    A = A / 2.0 ** squarings
+    term = np.eye(A.shape[0])
+    E = term.copy()
+    for i in range(1, terms + 1):
+        term = term @ A / i
+        E += term
+    for _ in range(squarings):
+        E = E @ E
+    return E
+
+
+class BatchedIntracellularModel:
+    # Viral and IFN models of every cell advanced together as NumPy arrays.
+    # Cells are addressed by their index in the arrays (cell.dict['Index']).
+    # With linear_fast_path, cells without virus are advanced by the exact solution of their (linear) IFN
+    # model and RK4 is only used for the others.
+    # integrator 'Adaptive' replaces RK4 by Dormand-Prince 5(4) with a step size per cell controlled by
+    # rtol and atol, so cells with smooth dynamics take few steps and fast growing infections many.
+    def __init__(self, number_cells, step_size, linear_fast_path=False, integrator='RK4', rtol=1e-6, atol=1e-12):
+        if integrator not in ['RK4', 'Adaptive']:
+            raise ValueError('Unknown intracellular integrator %s' % integrator)
+        self.parameters = dict(viral_parameters)
+        self.parameters.update(IFN_parameters)
+        self.step_size = step_size
+        self.linear_fast_path = linear_fast_path
+        self.propagator_key = None
+        self.integrator = integrator
+        self.rtol = rtol
+        self.atol = atol
+        self.cell_step_sizes = np.full(number_cells, step_size)
+        self.statistics = {'Steps': 0, 'Rejected': 0, 'Evaluations': 0, 'Time': 0.0,
+                           'MinStep': np.inf, 'MaxStep': 0.0}
+
+        # Initial Conditions
+        self.state = np.zeros((len(species), number_cells))
+        self.state[species.index('H')] = 1.0
+
+        # Inputs
+        self.IFNe = np.zeros(number_cells)
+
+    def __getitem__(self, name):
+        return self.state[species.index(name)]
+
+    def __setitem__(self, name, value):
+        self.state[species.index(name)] = value
+
+    def derivatives(self, y, IFNe):
+        p = self.parameters
+        V, H, IFN, STATP, IRF7, IRF7P = y
+        dy = np.empty_like(y)
+        # E7a: H -> ; H*k61*V
+        # E8a: -> V ; H*k71*V/(1.0+k72*IFNe*7E-5)
+        # E8b: V -> ; k73*V
+        dy[0] = H * p['k71'] * V / (1.0 + p['k72'] * IFNe * 7E-5) - p['k73'] * V
+        dy[1] = -H * p['k61'] * V
+        # E2a: -> IFN ; H*(k11*RIGI*V+k12*(V^n)/(k13+(V^n))+k14*IRF7P)
+        # E2b: IFN -> ; k21*IFN
+        Vn = V ** p['n']
+        dy[2] = H * (p['k11'] * p['RIGI'] * V + p['k12'] * Vn / (p['k13'] + Vn) + p['k14'] * IRF7P) \
+                - p['k21'] * IFN
+        # E4a: -> STATP ; H*k31*IFNe/(k32+k33*IFNe)
+        # E4b: STATP -> ; t3*STATP
+        dy[3] = H * p['k31'] * IFNe / (p['k32'] + p['k33'] * IFNe) - p['t3'] * STATP
+        # E5a: -> IRF7 ; H*(k41*STATP+k42*IRF7P)
+        # E5b: IRF7 -> ; t4*IRF7
+        dy[4] = H * (p['k41'] * STATP + p['k42'] * IRF7P) - p['t4'] * IRF7
+        # E6a: -> IRF7P ; H*k51*IRF7
+        # E6b: IRF7P -> ; t5*IRF7P
+        dy[5] = H * p['k51'] * IRF7 - p['t5'] * IRF7P
+        return dy
+
+    def step(self, cells=None):
+        # Step of all cells (or of the given cells only), IFNe is held constant over the step
+        nonlinear_step = self.adaptive_step if self.integrator == 'Adaptive' else self.rk4_step
+        if not self.linear_fast_path:
+            nonlinear_step(cells)
+            return
+        if cells is None:
+            linear = (self.state[0] == 0.0) & (self.state[1] == 1.0)
+            self.linear_step(np.flatnonzero(linear))
+            nonlinear_step(np.flatnonzero(~linear))
+        else:
+            linear = (self.state[0, cells] == 0.0) & (self.state[1, cells] == 1.0)
+            self.linear_step(cells[linear])
+            nonlinear_step(cells[~linear])
+
+    def linear_propagator(self):
+        # With V = 0 and H = 1, V and H stay constant and the IFN model is linear,
+        #   d[IFN, STATP, IRF7, IRF7P]/dt = A [IFN, STATP, IRF7, IRF7P] + [0, 1, 0, 0] * u
+        # with u = k31*IFNe/(k32+k33*IFNe) constant over the step. The exponential of the augmented matrix
+        # [[A, e_STATP], [0, 0]] * h gives the exact step, y(t + h) = E y(t) + F u.
+        p = self.parameters
+        key = tuple(p[name] for name in ['k14', 'k21', 't3', 'k41', 'k42', 't4', 'k51', 't5']) + (self.step_size,)
+        if key != self.propagator_key:
+            M = np.zeros((5, 5))
+            M[0, [0, 3]] = [-p['k21'], p['k14']]  # E2a (k14*IRF7P), E2b
+            M[1, [1, 4]] = [-p['t3'], 1.0]  # E4a (u), E4b
+            M[2, [1, 2, 3]] = [p['k41'], -p['t4'], p['k42']]  # E5a, E5b
+            M[3, [2, 3]] = [p['k51'], -p['t5']]  # E6a, E6b
+            E = expm(M * self.step_size)
+            self.propagator = E[:4, :4], E[:4, 4]
+            self.propagator_key = key
+        return self.propagator
+
+    def linear_step(self, cells):
+        # Exact step of cells with V = 0 and H = 1
+        p = self.parameters
+        E, F = self.linear_propagator()
+        rows = [species.index(name) for name in linear_species]
+        IFNe = self.IFNe[cells]
+        u = p['k31'] * IFNe / (p['k32'] + p['k33'] * IFNe)
+        self.state[np.ix_(rows, cells)] = E @ self.state[np.ix_(rows, cells)] + F[:, None] * u
+
+    def rk4_substeps(self):
+        # RK4 substeps per step keeping the fastest decay (E2b: k21*IFN at the default parameters) stable
+        p = self.parameters
+        rate = max(p['k21'], p['k73'], p['t3'], p['t4'], p['t5'])
+        return max(1, int(np.ceil(self.step_size * rate / rk4_limit)))
+
+    def rk4_step(self, cells=None):
+        # Classic RK4 step of all cells (or of the given cells only), in substeps if the step is too long
+        substeps = self.rk4_substeps()
+        h = self.step_size / substeps
+        if cells is None:
+            y = self.state
+            IFNe = self.IFNe
+        else:
+            y = self.state[:, cells]
+            IFNe = self.IFNe[cells]
+        for _ in range(substeps):
+            k1 = self.derivatives(y, IFNe)
+            k2 = self.derivatives(y + 0.5 * h * k1, IFNe)
+            k3 = self.derivatives(y + 0.5 * h * k2, IFNe)
+            k4 = self.derivatives(y + h * k3, IFNe)
+            y += h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+        if cells is not None:
+            self.state[:, cells] = y
+
+    def adaptive_step(self, cells=None):
+        # Dormand-Prince 5(4) over one step of all cells (or of the given cells only). Each cell takes
+        # steps of its own size, kept from one call to the next, until it reaches the end of the step.
+        cells = np.arange(self.IFNe.size) if cells is None else np.asarray(cells)
+        y = self.state[:, cells]
+        IFNe = self.IFNe[cells]
+        h = self.cell_step_sizes[cells]
+        remaining = np.full(cells.size, self.step_size)
+        statistics = self.statistics
+        todo = np.arange(cells.size)
+        while todo.size:
+            # The last step of a cell is stretched by up to 10% rather than leaving a sliver of the interval
+            trial = np.where(remaining[todo] < 1.1 * h[todo], remaining[todo], h[todo])
+            y0 = y[:, todo]
+            u = IFNe[todo]
+            k = [self.derivatives(y0, u)]
+            for a in dopri_a[1:]:
+                k.append(self.derivatives(y0 + trial * sum(a[j] * k[j] for j in range(len(a)) if a[j]), u))
+            y1 = y0 + trial * sum(b * kj for b, kj in zip(dopri_b, k) if b)
+            error = trial * sum(e * kj for e, kj in zip(dopri_e, k) if e)
+
+            # RMS norm of the error relative to the tolerances over the species of each cell
+            scale = self.atol + self.rtol * np.maximum(np.abs(y0), np.abs(y1))
+            norm = np.sqrt(np.mean((error / scale) ** 2, axis=0))
+            accept = norm <= 1.0
+            with np.errstate(divide='ignore'):
+                factor = np.clip(0.9 * norm ** -0.2, 0.2, 5.0)
+
+            done = todo[accept]
+            y[:, done] = y1[:, accept]
+            remaining[done] -= trial[accept]
+            # A step shortened to the end of the interval does not shrink the step size of the cell
+            shortened = accept & (trial < h[todo])
+            h[todo] = np.minimum(np.where(shortened, np.maximum(trial * factor, h[todo]), trial * factor),
+                                 self.step_size)
+            if np.any(h[todo] < 1e-12 * self.step_size):
+                raise RuntimeError('Step size underflow in the adaptive intracellular integrator')
+
+            statistics['Steps'] += int(np.sum(accept))
+            statistics['Rejected'] += int(todo.size - np.sum(accept))
+            statistics['Evaluations'] += len(k) * todo.size
+            if np.any(accept):
+                statistics['Time'] += float(np.sum(trial[accept]))
+                statistics['MinStep'] = min(statistics['MinStep'], float(np.min(trial[accept])))
+                statistics['MaxStep'] = max(statistics['MaxStep'], float(np.max(trial[accept])))
+            todo = todo[remaining[todo] > 1e-9 * self.step_size]
+        self.state[:, cells] = y
+        self.cell_step_sizes[cells] = h
+
+    def step_report(self):
+        # Step statistics of the adaptive integrator
+        s = self.statistics
+        if not s['Steps']:
+            return 'Adaptive intracellular integrator: no steps'
+        return 'Adaptive intracellular integrator (rtol %g, atol %g): %i steps, %i rejected, %i cell ' \
+               'evaluations, step size mean %.3g h, min %.3g h, max %.3g h' % (
+                   self.rtol, self.atol, s['Steps'], s['Rejected'], s['Evaluations'], s['Time'] / s['Steps'],
+                   s['MinStep'], s['MaxStep'])
@@ -0,0 +1,119 @@
+import numpy as np
+from ModelParameters import U, I1, I2, DEAD
+
+# Per-cell work of one MCS (field sampling, IFNe and virus secretion, type transitions) as one kernel over
+# flat arrays: cells' pixels in CSR form (pixels[starts[c]:starts[c + 1]] are the flat field indices of
+# cell c, pixel_cells the cell of each of them), per-cell species arrays and the flat fields.
+# The kernel is compiled with Numba when it is installed, otherwise the NumPy version below is used.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def transition_uniforms(types, rng):
+    # Uniforms of draw_transitions([I2 cells, I1 cells, U cells], rng) laid out by cell (1 for D cells)
+    groups = [np.flatnonzero(types == I2), np.flatnonzero(types == I1), np.flatnonzero(types == U)]
+    draws = rng.random(sum(group.size for group in groups))
+    uniforms = np.ones(types.size)
+    start = 0
+    for group in groups:
+        uniforms[group] = draws[start:start + group.size]
+        start += group.size
+    return uniforms
+
+
+def cell_step_loops(types, pixels, starts, pixel_cells, volumes, IFNe, Virus, IFN, V, H, k21, k73, k61, k, b,
+                    uniforms, IFNe_seen, Virus_seen):
+    # Returns the IFNe seen by live cells before secretion and the virus seen by all cells before virus
+    # secretion (ExtracellularIFN_Field and ExtracellularVirus_Field)
+    IFNe_total = 0.0
+    Virus_total = 0.0
+    for c in range(types.size):
+        cell_type = types[c]
+        first = starts[c]
+        last = starts[c + 1]
+
+        ## Measure amount of IFNe and production of IFNe
+        # E2b: IFN -> IFNe; k21 * IFN ;
+        seen = 0.0
+        for j in range(first, last):
+            seen += IFNe[pixels[j]]
+        if cell_type != DEAD:
+            IFNe_total += seen
+            amount = k21 * IFN[c] / volumes[c]
+            for j in range(first, last):
+                IFNe[pixels[j]] += amount / volumes[c]
+            seen += amount
+        IFNe_seen[c] = seen
+
+        ## Measure amount of virus and production of extracellular virus
+        # E8b: V -> ; k73 * V
+        seen = 0.0
+        for j in range(first, last):
+            seen += Virus[pixels[j]]
+        Virus_total += seen
+        if cell_type == I2:
+            amount = k73 * V[c] * 1094460.28 / volumes[c]
+            for j in range(first, last):
+                Virus[pixels[j]] += amount / volumes[c]
+            seen += amount
+        Virus_seen[c] = seen
+
+        ## Cell state transitions
+        if cell_type == I2:
+            # E7a: P -> ; P * k61 * V;
+            rate = k61 * V[c] * (1 - H[c])
+            new_type = DEAD
+        elif cell_type == I1:
+            # E2: I1 -> I2 ; k * I1
+            rate = k
+            new_type = I2
+        elif cell_type == U:
+            # E1: T -> I1 ; beta * V * T
+            rate = b * seen
+            new_type = I1
+        else:
+            continue
+        if uniforms[c] < 1.0 - np.exp(-rate):
+            types[c] = new_type
+            if new_type == I1:
+                V[c] = 6.9e-8
+    return IFNe_total, Virus_total
+
+
+def cell_step_numpy(types, pixels, starts, pixel_cells, volumes, IFNe, Virus, IFN, V, H, k21, k73, k61, k, b,
+                    uniforms, IFNe_seen, Virus_seen):
+    # Same as cell_step_loops with whole-array operations
+    live = types != DEAD
+    infected = types == I2
+
+    IFNe_seen[:] = np.bincount(pixel_cells, weights=IFNe[pixels], minlength=types.size)
+    IFNe_total = np.sum(IFNe_seen[live])
+    amount = np.where(live, k21 * IFN / volumes, 0.0)
+    IFNe[pixels] += (amount / volumes)[pixel_cells]
+    IFNe_seen += amount
+
+    Virus_seen[:] = np.bincount(pixel_cells, weights=Virus[pixels], minlength=types.size)
+    Virus_total = np.sum(Virus_seen)
+    amount = np.where(infected, k73 * V * 1094460.28 / volumes, 0.0)
+    Virus[pixels] += (amount / volumes)[pixel_cells]
+    Virus_seen += amount
+
+    rate = np.zeros(types.size)
+    rate[infected] = k61 * V[infected] * (1 - H[infected])
+    rate[types == I1] = k
+    rate[types == U] = b * Virus_seen[types == U]
+    transition = uniforms < 1.0 - np.exp(-rate)
+    new_I1 = transition & (types == U)
+    types[transition & infected] = DEAD
+    types[transition & (types == I1)] = I2
+    types[new_I1] = I1
+    V[new_I1] = 6.9e-8
+    return IFNe_total, Virus_total
+
+
+if njit is not None:
+    cell_step = njit(cache=True)(cell_step_loops)
+else:
+    cell_step = cell_step_numpy
@@ -0,0 +1,44 @@
+from IntracellularModel import viral_parameters, IFN_parameters
+
+# Parameters shared by the CC3D steppables and StandaloneModel.py
+
+# Cell types (TypeId in IFNModel.xml)
+U = 1
+I1 = 2
+I2 = 3
+DEAD = 4
+
+# Parameters of the Cell Transition Model used by the cellular model (FluModel_string)
+flu_parameters = {
+    'beta': 2.4 * 10 ** (-4),  # Virus Infective
+    'c': 13.0,  # Virus Clearance
+    'k': 4.0,  # Eclipse phase
+}
+
+# IFN Decay Rate
+t2 = 3.481
+
+# Parameters changed by each sweep, a swept value multiplies the reference value of its parameter
+sweeps = {
+    'k11': ['k11'],
+    'k31': ['k31'],
+    'k71': ['k71'],
+    'beta': ['beta'],
+    'idc': ['IFNe_dc'],
+    'dcs': ['IFNe_dc', 'virus_dc'],
+}
+k11_reference = 10.0 ** 5  # k11 is 0 in the base model
+
+
+def sweep_multipliers(config):
+    # Multipliers of the parameters changed by the sweep of a run
+    return dict(zip(sweeps.get(config.Sweep, []), config.Values))
+
+
+def intracellular_value(name, multiplier):
+    # Swept value of an intracellular parameter
+    if name == 'k11':
+        return k11_reference * multiplier
+    if name in viral_parameters:
+        return viral_parameters[name] * multiplier
+    return IFN_parameters[name] * multiplier
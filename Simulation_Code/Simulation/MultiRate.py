@@ -0,0 +1,65 @@
+import numpy as np
+
+# Step sizes of the components of the model independent of the MCS (min_to_mcs). A component with a step
+# shorter than an MCS takes several substeps per MCS, one with a longer step steps once every few MCS.
+# Diffusion already substeps as often as stability needs (FieldSolver.diffusion_substeps, DiffusionSolverFE),
+# the intracellular models and FluModel follow IntracellularStep and FluStep (see RunConfiguration.py).
+
+
+class MultiRateSchedule:
+    def __init__(self, step, mcs_step):
+        # step and mcs_step in the same units (min), step <= 0 for one step per MCS. Other steps must divide
+        # the MCS or be a multiple of it, so the component runs at the configured rate.
+        if step <= 0 or np.isclose(step, mcs_step):
+            self.every, self.substeps = 1, 1
+        elif step < mcs_step:
+            self.every, self.substeps = 1, int(round(mcs_step / step))
+        else:
+            self.every, self.substeps = int(round(step / mcs_step)), 1
+        if step > 0 and not np.isclose(self.every * mcs_step / self.substeps, step):
+            raise ValueError('Step of %g min is neither a multiple nor a divisor of the MCS (%g min)'
+                             % (step, mcs_step))
+        # MCS per step of the component, to scale the MCS step size (e.g. hours_to_mcs)
+        self.mcs_per_step = self.every / self.substeps
+
+    def due(self, mcs):
+        return mcs % self.every == 0
+
+    @property
+    def single(self):
+        return self.every == 1 and self.substeps == 1
+
+
+class IntracellularClock:
+    # Advances a BatchedIntracellularModel by one MCS at the step size of a MultiRateSchedule. With a step
+    # longer than an MCS, the model steps ahead once every `every` MCS with the IFNe seen then, and the
+    # state seen by the other steppables in between is interpolated linearly over the step. Values written
+    # into the state meanwhile (V of newly infected cells) are carried over to the rest of the step.
+    def __init__(self, model, schedule, hours_to_mcs):
+        self.model = model
+        self.schedule = schedule
+        model.step_size = hours_to_mcs * schedule.mcs_per_step
+        self.phase = 0
+        self.start = None
+        self.end = None
+        self.last = None
+
+    def step(self):
+        model = self.model
+        if self.schedule.every == 1:
+            for _ in range(self.schedule.substeps):
+                model.step()
+            return
+
+        if self.phase == 0:
+            self.start = model.state.copy()
+            model.step()
+            self.end = model.state.copy()
+        else:
+            changed = model.state != self.last
+            self.start[changed] = model.state[changed]
+            self.end[changed] = model.state[changed]
+        self.phase = (self.phase + 1) % self.schedule.every
+        fraction = self.phase / self.schedule.every if self.phase else 1.0
+        model.state[:] = self.start + fraction * (self.end - self.start)
+        self.last = model.state.copy()
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class OutputSchedule:
+    # MCS on which the output is measured and written, independently of the simulation step.
+    # 'every': every interval MCS, 'log': about points log-spaced MCS, 'event': whenever a population
+    # fraction (U, I1, I2, D) changed by more than threshold since the last output.
+    # The first and last MCS are always output steps.
+    def __init__(self, cadence, last_mcs, interval=1, points=100, threshold=0.01):
+        if cadence not in ['every', 'log', 'event']:
+            raise ValueError('Unknown output cadence %s' % cadence)
+        self.cadence = cadence
+        self.last_mcs = last_mcs
+        self.interval = max(int(interval), 1)
+        self.threshold = threshold
+        self.steps = set()
+        if cadence == 'log' and last_mcs > 0:
+            self.steps = set(np.unique(np.round(np.logspace(0.0, np.log10(last_mcs), points))).astype(int).tolist())
+        self.last_fractions = None
+
+    def is_output_step(self, mcs, fractions):
+        if mcs == 0 or mcs >= self.last_mcs or self.last_fractions is None:
+            output = True
+        elif self.cadence == 'every':
+            output = mcs % self.interval == 0
+        elif self.cadence == 'log':
+            output = mcs in self.steps
+        else:
+            output = np.max(np.abs(np.asarray(fractions) - self.last_fractions)) > self.threshold
+        if output:
+            self.last_fractions = np.array(fractions, dtype=float)
+        return output
@@ -0,0 +1,102 @@
+import os
+import sys
+import numpy as np
+
+# Intracellular species averaged over live cells in the output, and statistics of their spread
+output_species = ['V', 'H', 'STATP', 'IRF7', 'IRF7P', 'IFN']
+summary_statistics = ['Q05', 'Q25', 'Median', 'Q75', 'Q95', 'Var']
+
+
+# Rows of the output tables, shared by the steppables and StandaloneModel so both write the same files
+
+def plaque_radii(volume_I1, volume_I2, volume_D):
+    # avgI1rd, avgI2rd, avgDrd: radii of the areas occupied by D, D + I2 and D + I2 + I1 cells, assuming
+    # each is a circle
+    avgDrd = np.sqrt(volume_D / np.pi)
+    avgI2rd = np.sqrt((volume_D + volume_I2) / np.pi)
+    avgI1rd = np.sqrt((volume_D + volume_I2 + volume_I1) / np.pi)
+    return avgI1rd, avgI2rd, avgDrd
+
+
+def intracellular_means(state):
+    # Means of the output_species over the live cells of a (species, cells) array, 0 without live cells
+    if state.shape[1] > 0:
+        return np.mean(state, axis=1)
+    return np.zeros(len(output_species))
+
+
+def intracellular_summary(state):
+    # summary_statistics of each of the output_species (species by species) of a (species, cells) array
+    if state.shape[1] > 0:
+        quantiles = np.percentile(state, [5.0, 25.0, 50.0, 75.0, 95.0], axis=1)
+        return np.vstack([quantiles, np.var(state, axis=1)]).T.ravel()
+    return np.zeros(len(output_species) * len(summary_statistics))
+
+
+class OutputWriter:
+    # Buffered writer of one output table (<name>.txt or <name>.npy). Rows are kept in memory and
+    # written every flush_interval rows and on close(). 'txt' writes the comma separated %e rows read
+    # by the Plot_* scripts, 'npy' appends each chunk as a structured array to a stream of .npy
+    # records that load_output() reads back and export_csv() converts to the 'txt' format.
+    def __init__(self, name, columns, output_format='txt', flush_interval=48):
+        self.columns = columns
+        self.output_format = output_format
+        self.flush_interval = flush_interval
+        self.rows = []
+        if output_format == 'txt':
+            self.path = name + '.txt'
+            self.file = open(self.path, 'w')
+            self.file.write(','.join(columns) + '\n')
+        elif output_format == 'npy':
+            self.path = name + '.npy'
+            self.file = open(self.path, 'wb')
+        else:
+            raise ValueError('Unknown output format %s' % output_format)
+
+    def write(self, *row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.output_format == 'txt':
+            row_format = ','.join(['%e'] * len(self.columns)) + '\n'
+            self.file.write(''.join(row_format % row for row in self.rows))
+        else:
+            chunk = np.array(self.rows, dtype=[(c, float) for c in self.columns])
+            np.save(self.file, chunk)
+        self.file.flush()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def load_output(path):
+    # All chunks of a .npy output stream as one structured array
+    chunks = []
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while f.tell() < size:
+            chunks.append(np.load(f))
+    return np.concatenate(chunks)
+
+
+def export_csv(path, csv_path=None):
+    # Writes a .npy output stream in the format of the 'txt' output
+    data = load_output(path)
+    csv_path = csv_path or os.path.splitext(path)[0] + '.txt'
+    with open(csv_path, 'w') as f:
+        f.write(','.join(data.dtype.names) + '\n')
+        row_format = ','.join(['%e'] * len(data.dtype.names)) + '\n'
+        f.write(''.join(row_format % tuple(row) for row in data))
+    return csv_path
+
+
+if __name__ == '__main__':
+    # python OutputWriter.py FullModelCellular_1.npy [...]
+    for path in sys.argv[1:]:
+        print(export_csv(path))
@@ -1 +1,5 @@
-R = 0
+R = 0  # Replicate
+Sweep = 'Baseline'  # Name of the parameter sweep the simulation belongs to
+Values = [1.0]  # Values of the swept parameter(s)
+Seed = 0  # Base seed of the random streams
+OutputFolder = 'Output'  # Relative to the working directory
@@ -0,0 +1,80 @@
+import time
+import numpy as np
+
+# Wall time of the phases of each MCS, e.g.
+#   with profiler.phase('Cellular: Secretion'):
+#       ...
+# Every call of a phase is kept, report() gives calls, total, mean and percentiles per phase and a
+# histogram of the call times over decades from 1 us to 10 s. A disabled profiler hands out one shared
+# no-op context manager, so instrumented code costs a method call per phase.
+
+histogram_bins = 10.0 ** np.arange(-6, 2)  # s
+
+
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+null_phase = NullPhase()
+
+
+class Phase:
+    __slots__ = ['times', 'start']
+
+    def __init__(self, times):
+        self.times = times
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.times.append(time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = {}
+        self.marks = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return null_phase
+        return Phase(self.times.setdefault(name, []))
+
+    def mark(self, name):
+        # Remembers the current time, for time spent outside the instrumented code (see since())
+        if self.enabled:
+            self.marks[name] = time.perf_counter()
+
+    def since(self, mark, name):
+        # Adds the time since mark() to a phase
+        if self.enabled and mark in self.marks:
+            self.times.setdefault(name, []).append(time.perf_counter() - self.marks[mark])
+
+    def report(self):
+        total = sum(np.sum(times) for times in self.times.values())
+        header = '%-40s %8s %10s %6s %10s %10s %10s %10s' % ('Phase', 'Calls', 'Total (s)', '%', 'Mean (ms)',
+                                                              'Median', 'P95', 'Max')
+        lines = [header]
+        for name, times in sorted(self.times.items(), key=lambda item: -np.sum(item[1])):
+            times = np.array(times)
+            lines.append('%-40s %8i %10.3f %6.1f %10.3f %10.3f %10.3f %10.3f' % (
+                name, times.size, np.sum(times), 100.0 * np.sum(times) / total if total else 0.0,
+                1e3 * np.mean(times), 1e3 * np.median(times), 1e3 * np.percentile(times, 95), 1e3 * np.max(times)))
+        lines.append('')
+        lines.append('%-40s ' % 'Calls per time decade' + ' '.join('%8s' % ('<%gs' % b) for b in histogram_bins[1:]))
+        for name, times in sorted(self.times.items()):
+            counts, _ = np.histogram(np.clip(times, histogram_bins[0], histogram_bins[-1]), histogram_bins)
+            lines.append('%-40s ' % name + ' '.join('%8i' % c for c in counts))
+        return '\n'.join(lines)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.report() + '\n')
@@ -0,0 +1,16 @@
+import zlib
+import numpy as np
+
+
+def simulation_seed_sequence(sweep, values, replicate, seed=0):
+    # SeedSequence keyed by (sweep, parameter values, replicate). The key does not depend on the
+    # order in which simulations are launched, so any replicate can be re-run on its own and
+    # replicates running in parallel processes draw from independent streams.
+    key = [zlib.crc32(sweep.encode())]
+    key += [zlib.crc32(('%.2f' % value).encode()) for value in values]
+    key += [replicate]
+    return np.random.SeedSequence(seed, spawn_key=tuple(key))
+
+
+def simulation_rng(sweep, values, replicate, seed=0):
+    return np.random.default_rng(simulation_seed_sequence(sweep, values, replicate, seed))
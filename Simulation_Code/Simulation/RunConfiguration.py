@@ -0,0 +1,92 @@
+import json
+import os
+import Parameters
+
+
+class RunConfiguration:
+    # Settings of one simulation run. Values come from the defaults below, then from the JSON file
+    # named by IFNMODEL_CONFIG (if any), then from IFNMODEL_<NAME> environment variables
+    # (e.g. IFNMODEL_REPLICATE=3, IFNMODEL_VALUES=10.0,1.0).
+    defaults = {
+        'IFNWash': False,  # Whether the plate is prestimulated with IFNe before infection
+        'IntracellularSolver': 'SBML',  # 'SBML' for per-cell Antimony models, 'Fused' for a single coupled
+                                        # Antimony model per cell, 'Batched' for the NumPy engine
+        'min_to_mcs': 10.0,  # min/mcs
+        'hours_to_simulate': 80.0,  # 10 in the original model
+        'IntracellularIntegrator': 'RK4',  # Batched engine: 'RK4' or 'Adaptive' (Dormand-Prince 5(4), step per cell)
+        'IntracellularRtol': 1e-6,  # Tolerances of the adaptive integrator
+        'IntracellularAtol': 1e-12,
+        'LinearFastPath': False,  # Batched engine: exact update of the (linear) IFN model of cells without virus
+        'IntracellularStep': 0.0,  # min, step of the batched intracellular models (0: one step per MCS), see
+                                   # MultiRate.py
+        'FluStep': 0.0,  # min, step of FluModel (0: one step per MCS)
+        'FieldSolver': 'CC3D',  # 'CC3D' for DiffusionSolverFE, 'stencil' or 'spectral' for FieldSolver.py
+        'virus_diffusion_coefficient': 1.0 / 10.0,  # vl^2 / min
+        'IFNe_diffusion_coefficient': 1.0 / 10.0,  # vl^2 / min
+        'LatticeSize': 300,  # Pixels per side of the lattice of StandaloneModel.py (IFNModel.xml for CC3D)
+        'CellWidth': 3,  # Pixels per side of the square cells of StandaloneModel.py
+        'Replicate': Parameters.R,
+        'Sweep': Parameters.Sweep,  # Name of the parameter sweep the simulation belongs to
+        'Values': Parameters.Values,  # Values of the swept parameter(s)
+        'Seed': Parameters.Seed,  # Base seed of the random streams
+        'OutputFolder': Parameters.OutputFolder,
+        'OutputFormat': 'txt',  # 'txt' for comma separated text, 'npy' for binary chunks (see OutputWriter.py)
+        'OutputFlushInterval': 48,  # Output rows kept in memory before writing them to disk
+        'OutputCadence': 'every',  # 'every' OutputInterval MCS, 'log' for OutputPoints log-spaced MCS or 'event'
+                                   # when a population fraction changed by more than OutputThreshold
+        'OutputInterval': 1,
+        'OutputPoints': 100,
+        'OutputThreshold': 0.01,
+        'IntracellularSummary': False,  # Also write quantiles and variance of the intracellular species
+        'ActiveSet': False,  # StandaloneModel.py only updates the region around the plaque (stencil solver)
+        'ActiveTolerance': 1e-12,  # Field values and intracellular IFN species below which tissue is quiescent
+        'Profile': False,  # Time the phases of each MCS and write Profile_<run>.txt at the end
+        'ConsistencyCheckInterval': 0,  # Recount cells by type every N MCS to check the running totals (0: never)
+    }
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.defaults)
+        if unknown:
+            raise ValueError('Unknown run settings: %s' % ', '.join(sorted(unknown)))
+        for name, value in self.defaults.items():
+            setattr(self, name, settings.get(name, value))
+
+    @classmethod
+    def load(cls, path=None):
+        settings = {}
+        path = path or os.environ.get('IFNMODEL_CONFIG')
+        if path:
+            with open(path) as f:
+                settings.update(json.load(f))
+        for name, default in cls.defaults.items():
+            value = os.environ.get('IFNMODEL_%s' % name.upper())
+            if value is not None:
+                settings[name] = cls.parse(value, default)
+        return cls(**settings)
+
+    @staticmethod
+    def parse(value, default):
+        if isinstance(default, bool):
+            return value.lower() in ['1', 'true', 'yes']
+        if isinstance(default, list):
+            return [float(v) for v in value.split(',')]
+        return type(default)(value)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({name: getattr(self, name) for name in self.defaults}, f, indent=4)
+
+    @property
+    def hours_to_mcs(self):
+        return self.min_to_mcs / 60.0  # hours/mcs
+
+    @property
+    def days_to_mcs(self):
+        return self.min_to_mcs / 1440.0  # day/mcs
+
+    @property
+    def run_name(self):
+        # <sweep>_<values>_<replicate> for sweeps, <replicate> otherwise
+        if self.Sweep == 'Baseline':
+            return '%i' % self.Replicate
+        return '%s_%s_%i' % (self.Sweep, '_'.join('%.2f' % v for v in self.Values), self.Replicate)
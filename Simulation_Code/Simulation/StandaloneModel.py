@@ -0,0 +1,305 @@
+import argparse
+import os
+import time
+import numpy as np
+from RunConfiguration import RunConfiguration
+from IntracellularModel import BatchedIntracellularModel, species
+from ModelParameters import U, I1, I2, DEAD, flu_parameters, t2, sweep_multipliers, intracellular_value
+from CellPixels import CellPixelIndex
+from FieldSolver import FieldSolver
+from Kernels import cell_step, transition_uniforms
+from RandomStreams import simulation_rng
+from OutputWriter import OutputWriter, output_species, summary_statistics, plaque_radii, intracellular_means, \
+    intracellular_summary
+from OutputSchedule import OutputSchedule
+from Profiling import Profiler
+from MultiRate import MultiRateSchedule, IntracellularClock
+
+# The model of IFNModel.cc3d without CC3D. All cells of IFNModel.xml are frozen squares laid out by
+# UniformInitializer, so the tissue is a regular grid of cells on a periodic lattice. Each MCS follows
+# the steppables (diffusion, secretion, transitions, intracellular step, output) with the batched
+# intracellular engine, FieldSolver and the per-cell kernel of Kernels.py, and writes the same output files.
+# Run settings come from RunConfiguration (LatticeSize and CellWidth replace the Potts dimensions and
+# initializer width), e.g.
+#   IFNMODEL_REPLICATE=1 IFNMODEL_OUTPUTFOLDER=out python StandaloneModel.py
+# With ActiveSet, only the active region is updated: a box of whole cells holding every pixel where a field
+# exceeds ActiveTolerance plus a halo the fields cannot cross in one MCS (grown each MCS, never shrunk).
+# Cells outside it see no IFNe or virus and are at steady state, so they are not sampled, drawn or
+# integrated, and the stencil only runs over the box until it reaches the edges of the lattice.
+
+
+def grid_labels(lattice_size, cell_width):
+    # Index of the cell at each pixel, cells numbered in the order UniformInitializer creates them
+    if lattice_size % cell_width:
+        raise ValueError('LatticeSize %i is not a multiple of CellWidth %i' % (lattice_size, cell_width))
+    cells_per_side = lattice_size // cell_width
+    cell = np.arange(lattice_size) // cell_width
+    return cell[:, None] * cells_per_side + cell[None, :]
+
+
+class StandaloneModel:
+    def __init__(self, config=None):
+        self.config = config or RunConfiguration.load()
+        config = self.config
+        multipliers = sweep_multipliers(config)
+
+        # Tissue
+        labels = grid_labels(config.LatticeSize, config.CellWidth)
+        self.index = CellPixelIndex(labels)
+        self.number_cells = self.index.number_cells
+        self.types = np.full(self.number_cells, U)
+
+        # Random stream of this simulation
+        self.rng = simulation_rng(config.Sweep, config.Values, config.Replicate, config.Seed)
+
+        # Fields, DiffusionSolverFE is replaced by the stencil solver unless spectral is asked for
+        method = 'spectral' if config.FieldSolver == 'spectral' else 'stencil'
+        self.IFNe = FieldSolver(self.index, config.IFNe_diffusion_coefficient * multipliers.get('IFNe_dc', 1.0)
+                                * config.min_to_mcs, t2 * config.hours_to_mcs, method)
+        self.Virus = FieldSolver(self.index, config.virus_diffusion_coefficient * multipliers.get('virus_dc', 1.0)
+                                 * config.min_to_mcs, flu_parameters['c'] * config.days_to_mcs, method)
+        self.volumes = self.index.volumes.astype(float)
+        self.IFNe_Field = np.zeros(self.number_cells)
+        self.Virus_Field = np.zeros(self.number_cells)
+
+        # Intracellular models and swept parameters
+        self.model = BatchedIntracellularModel(self.number_cells, config.hours_to_mcs, config.LinearFastPath,
+                                               config.IntracellularIntegrator, config.IntracellularRtol,
+                                               config.IntracellularAtol)
+        self.clock = IntracellularClock(self.model, MultiRateSchedule(config.IntracellularStep, config.min_to_mcs),
+                                        config.hours_to_mcs)
+        self.beta = flu_parameters['beta']
+        for name, multiplier in multipliers.items():
+            if name == 'beta':
+                self.beta = flu_parameters['beta'] * multiplier
+            elif name in ['k11', 'k31', 'k71']:
+                self.model.parameters[name] = intracellular_value(name, multiplier)
+
+        # Initial conditions: infected cell in the center
+        center = labels[config.LatticeSize // 2, config.LatticeSize // 2]
+        self.types[center] = I1
+        self.model['V'][center] = 6.9e-8
+
+        # Set prestimulated internal protein values
+        if config.IFNWash:
+            self.model['IFN'] = 0.035
+            self.model['IRF7'] = 0.097
+            self.model['IRF7P'] = 0.028
+            self.model['STATP'] = 0.714
+        self.count_types()
+
+        self.profiler = Profiler(config.Profile)
+        # Active region
+        self.active = config.ActiveSet
+        if self.active:
+            if method == 'spectral':
+                raise ValueError('ActiveSet needs the stencil field solver')
+            if not self.clock.schedule.single:
+                raise ValueError('ActiveSet steps the intracellular models once per MCS')
+            self.labels = labels
+            self.tolerance = config.ActiveTolerance
+            self.halo = max(self.IFNe.substeps, self.Virus.substeps) + 1
+            self.reset_active_region()
+
+        self.steps = int(config.hours_to_simulate / config.hours_to_mcs)
+        self.schedule = OutputSchedule(config.OutputCadence, self.steps - 1, config.OutputInterval,
+                                       config.OutputPoints, config.OutputThreshold)
+
+        # Output files of OutputSteppable and PlaqueAssaySteppable
+        os.makedirs(config.OutputFolder, exist_ok=True)
+        self.output1 = OutputWriter(os.path.join(config.OutputFolder, 'FullModelCellular_%s' % config.run_name),
+                                    ['Time', 'U', 'I1', 'I2', 'D', 'Ve', 'IFNe'],
+                                    config.OutputFormat, config.OutputFlushInterval)
+        self.output2 = OutputWriter(os.path.join(config.OutputFolder,
+                                                 'FullModelIntracellular_%s' % config.run_name),
+                                    ['Time', 'V', 'H', 'P', 'IFNe', 'STATP', 'IRF7', 'IRF7P', 'IFN'],
+                                    config.OutputFormat, config.OutputFlushInterval)
+        self.output3 = OutputWriter(os.path.join(config.OutputFolder, 'PlaqueAssay_%s' % config.run_name),
+                                    ['Time', 'avgI1rd', 'avgI2rd', 'avgDrd'],
+                                    config.OutputFormat, config.OutputFlushInterval)
+        if config.IntracellularSummary:
+            self.output4 = OutputWriter(os.path.join(config.OutputFolder,
+                                                     'FullModelIntracellularSummary_%s' % config.run_name),
+                                        ['Time'] + ['%s%s' % (name, statistic) for name in output_species
+                                                    for statistic in summary_statistics],
+                                        config.OutputFormat, config.OutputFlushInterval)
+
+    def step(self, mcs):
+        config = self.config
+        model = self.model
+        output_step = self.schedule.is_output_step(mcs, self.type_counts[[U, I1, I2, DEAD]] / self.number_cells)
+
+        profiler = self.profiler
+
+        if self.active:
+            ExtracellularIFN_Field, ExtracellularVirus_Field = self.active_step(profiler)
+            if output_step:
+                with profiler.phase('Output'):
+                    self.output(mcs, self.IFNe_Field, ExtracellularIFN_Field, ExtracellularVirus_Field)
+            return
+
+        # Diffusion and decay
+        with profiler.phase('Diffusion'):
+            self.IFNe.step()
+            self.Virus.step()
+
+        ## Field sampling, secretion and cell state transitions of all cells
+        with profiler.phase('Cell kernel'):
+            uniforms = transition_uniforms(self.types, self.rng)
+            ExtracellularIFN_Field, ExtracellularVirus_Field = cell_step(
+                self.types, self.index.pixels, self.index.starts, self.index.pixel_cells, self.volumes,
+                self.IFNe.field.ravel(), self.Virus.field.ravel(), model['IFN'], model['V'], model['H'],
+                model.parameters['k21'] * config.hours_to_mcs, model.parameters['k73'] * config.hours_to_mcs,
+                model.parameters['k61'] * config.hours_to_mcs, flu_parameters['k'] * config.days_to_mcs,
+                self.beta * self.number_cells * config.days_to_mcs, uniforms, self.IFNe_Field, self.Virus_Field)
+            self.count_types()
+        IFNe_Field = self.IFNe_Field
+
+        ## Updating Cellular Models
+        with profiler.phase('Intracellular step'):
+            model.IFNe[:] = IFNe_Field
+            self.clock.step()
+
+        if output_step:
+            with profiler.phase('Output'):
+                self.output(mcs, IFNe_Field, ExtracellularIFN_Field, ExtracellularVirus_Field)
+
+    def active_step(self, profiler):
+        # step() over the cells of the active region
+        config = self.config
+        model = self.model
+        cells = self.cells
+        pixels, starts, pixel_cells = self.cell_pixels
+        region = None if self.region == (0, config.LatticeSize, 0, config.LatticeSize) else self.region
+
+        with profiler.phase('Diffusion'):
+            self.IFNe.step(region)
+            self.Virus.step(region)
+
+        with profiler.phase('Cell kernel'):
+            types = self.types[cells]
+            old_types = types.copy()
+            V = model['V'][cells]
+            IFNe_Field = np.empty(cells.size)
+            Virus_Field = np.empty(cells.size)
+            uniforms = transition_uniforms(types, self.rng)
+            ExtracellularIFN_Field, ExtracellularVirus_Field = cell_step(
+                types, pixels, starts, pixel_cells, self.volumes[cells],
+                self.IFNe.field.ravel(), self.Virus.field.ravel(), model['IFN'][cells], V, model['H'][cells],
+                model.parameters['k21'] * config.hours_to_mcs, model.parameters['k73'] * config.hours_to_mcs,
+                model.parameters['k61'] * config.hours_to_mcs, flu_parameters['k'] * config.days_to_mcs,
+                self.beta * self.number_cells * config.days_to_mcs, uniforms, IFNe_Field, Virus_Field)
+            self.types[cells] = types
+            self.update_type_counts(old_types, types, self.volumes[cells])
+            model['V'][cells] = V
+            self.IFNe_Field[cells] = IFNe_Field
+            self.Virus_Field[cells] = Virus_Field
+
+        ## Updating Cellular Models away from steady state (no virus, IFNe or IFN signalling)
+        with profiler.phase('Intracellular step'):
+            IFN_species = [species.index(name) for name in ['IFN', 'STATP', 'IRF7', 'IRF7P']]
+            changing = (types != DEAD) & ((V > 0) | (IFNe_Field > self.tolerance)
+                                          | np.any(model.state[np.ix_(IFN_species, cells)] > self.tolerance, axis=0))
+            model.IFNe[cells] = IFNe_Field
+            model.step(cells[changing])
+
+        with profiler.phase('Active region'):
+            x0, x1, y0, y1 = self.region
+            above = (self.IFNe.field[x0:x1, y0:y1] > self.tolerance) | (self.Virus.field[x0:x1, y0:y1] > self.tolerance)
+            rows = np.flatnonzero(np.any(above, axis=1))
+            columns = np.flatnonzero(np.any(above, axis=0))
+            if rows.size:
+                self.grow_region(x0 + rows[0], x0 + rows[-1] + 1, y0 + columns[0], y0 + columns[-1] + 1)
+        return ExtracellularIFN_Field, ExtracellularVirus_Field
+
+    def count_types(self):
+        # Cells and volume of each type, kept up to date at the transitions
+        self.type_counts = np.bincount(self.types, minlength=DEAD + 1)
+        self.type_volumes = np.bincount(self.types, weights=self.volumes, minlength=DEAD + 1)
+
+    def update_type_counts(self, old_types, new_types, volumes):
+        # Type counts after some cells changed from old_types to new_types, without a pass over all cells
+        self.type_counts += np.bincount(new_types, minlength=DEAD + 1) - np.bincount(old_types, minlength=DEAD + 1)
+        self.type_volumes += np.bincount(new_types, weights=volumes, minlength=DEAD + 1) \
+                             - np.bincount(old_types, weights=volumes, minlength=DEAD + 1)
+
+    def reset_active_region(self):
+        # Active region around the cells away from steady state in the current state, e.g. after the types
+        # and intracellular state were set from outside (Benchmark.seed_plaque)
+        IFN_species = [species.index(name) for name in ['IFN', 'STATP', 'IRF7', 'IRF7P']]
+        changing = (self.types != U) | (self.model['V'] > 0) \
+                   | np.any(self.model.state[IFN_species] > self.tolerance, axis=0)
+        self.region = None
+        self.grow_region(*self.cell_box(np.flatnonzero(changing)))
+
+    def cell_box(self, cells):
+        # Pixel bounding box (x0, x1, y0, y1) of cells of the grid
+        width = self.config.CellWidth
+        rows, columns = np.divmod(cells, self.config.LatticeSize // width)
+        return rows.min() * width, (rows.max() + 1) * width, columns.min() * width, (columns.max() + 1) * width
+
+    def grow_region(self, x0, x1, y0, y1):
+        # Adds a box (widened by the halo, to whole cells) to the active region. Once the region is within a
+        # pixel of the edges of the lattice, it is the whole (periodic) lattice.
+        width = self.config.CellWidth
+        size = self.config.LatticeSize
+        x0, y0 = (max(0, v - self.halo) // width * width for v in (x0, y0))
+        x1, y1 = (min(size, -(-(v + self.halo) // width) * width) for v in (x1, y1))
+        if self.region is not None:
+            x0, x1 = min(x0, self.region[0]), max(x1, self.region[1])
+            y0, y1 = min(y0, self.region[2]), max(y1, self.region[3])
+        if min(x0, y0) < 1 or max(x1, y1) > size - 1:
+            x0, x1, y0, y1 = 0, size, 0, size
+        if (x0, x1, y0, y1) != self.region:
+            self.region = (x0, x1, y0, y1)
+            self.cells = self.labels[x0:x1:width, y0:y1:width].ravel()
+            self.cell_pixels = self.index.subset(self.cells)
+
+    def output(self, mcs, IFNe_Field, ExtracellularIFN_Field, ExtracellularVirus_Field):
+        N = self.number_cells
+        Time = mcs * self.config.hours_to_mcs
+        counts = self.type_counts
+        volumes = self.type_volumes
+
+        # PlaqueAssaySteppable
+        avgI1rd, avgI2rd, avgDrd = plaque_radii(volumes[I1], volumes[I2], volumes[DEAD])
+        self.output3.write(Time, avgI1rd, avgI2rd, avgDrd)
+
+        # OutputSteppable
+        self.output1.write(Time, counts[U] / N, counts[I1] / N, counts[I2] / N, counts[DEAD] / N,
+                           ExtracellularVirus_Field, np.sum(IFNe_Field))
+
+        L = counts[U] + counts[I1] + counts[I2]
+        state = np.array([self.model[name][self.types != DEAD] for name in output_species])
+        V, H, STATP, IRF7, IRF7P, IFN = intracellular_means(state)
+        self.output2.write(Time, V, H, L / N, ExtracellularIFN_Field / N, STATP, IRF7, IRF7P, IFN)
+
+        if self.config.IntracellularSummary:
+            self.output4.write(Time, *intracellular_summary(state))
+
+    def finish(self):
+        self.output1.close()
+        self.output2.close()
+        self.output3.close()
+        if self.config.IntracellularSummary:
+            self.output4.close()
+        if self.config.IntracellularIntegrator == 'Adaptive':
+            print(self.model.step_report())
+        if self.config.Profile:
+            self.profiler.save(os.path.join(self.config.OutputFolder, 'Profile_%s.txt' % self.config.run_name))
+            print(self.profiler.report())
+
+    def run(self):
+        for mcs in range(self.steps):
+            self.step(mcs)
+        self.finish()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='IFN model without CC3D')
+    parser.add_argument('--config', help='JSON file of run settings (see RunConfiguration.py)')
+    args = parser.parse_args()
+    start = time.time()
+    simulation = StandaloneModel(RunConfiguration.load(args.config))
+    simulation.run()
+    print('%i cells, %i MCS in %.1f s' % (simulation.number_cells, simulation.steps, time.time() - start))
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def transition_probability(rate):
+    # Probability of at least one event over a step for an exponential waiting time with the given rate
+    return 1.0 - np.exp(-rate)
+
+
+def draw_transitions(rates, rng):
+    # Bernoulli draws for several groups of cells with a single batched call to the RNG.
+    # rates is a list of per-cell rate arrays (one per transition); returns one boolean array per group.
+    rates = [np.asarray(r, dtype=float) for r in rates]
+    sizes = [r.size for r in rates]
+    uniforms = rng.random(sum(sizes))
+    draws = uniforms < transition_probability(np.concatenate(rates))
+    return np.split(draws, np.cumsum(sizes)[:-1])